@@ -0,0 +1,253 @@
+# Budget and spike alerts, checked as expenses are written.
+#
+# State is kept per (category, person) with "*" meaning "all":
+#   - month-to-date spend, for monthly budgets (warn at 80%, alert at 100%)
+#   - an exponentially weighted mean/variance of single expense amounts,
+#     a sliding window of roughly the last SPIKE_WINDOW expenses, for spikes
+# Each new row costs O(1): a few keyed lookups and updates, no scans.
+# Alerts go to the "alerts" outbox table for whatever delivers them.
+#
+#   python alerts.py budget Groceries 8000 [--person Wife]
+#   python alerts.py list
+#   python alerts.py rebuild [--emit]
+
+import math
+from datetime import datetime
+
+ALL = "*"
+BUDGET_LEVELS = [(0.8, "budget_warning"), (1.0, "budget_exceeded")]
+SPIKE_WINDOW = 30
+SPIKE_ALPHA = 2 / (SPIKE_WINDOW + 1)
+SPIKE_SIGMA = 3.0
+SPIKE_MIN_HISTORY = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS budgets (
+    category TEXT NOT NULL,
+    person TEXT NOT NULL DEFAULT '*',
+    monthly_limit NUMERIC NOT NULL,
+    PRIMARY KEY (category, person)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alert_month_state (
+    category TEXT NOT NULL,
+    person TEXT NOT NULL,
+    month TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    PRIMARY KEY (category, person, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alert_amount_stats (
+    category TEXT NOT NULL,
+    person TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    var REAL NOT NULL,
+    PRIMARY KEY (category, person)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    category TEXT NOT NULL,
+    person TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    threshold NUMERIC NOT NULL,
+    message TEXT NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_pending ON alerts(delivered, id);
+"""
+
+
+def _scopes(category, person):
+    return [(category, person), (category, ALL), (ALL, person), (ALL, ALL)]
+
+
+def process_rows(conn, rows, emit=True):
+    # Update alert state for newly written rows and queue any alerts. Runs
+    # inside the caller's transaction, so state and rows commit together.
+    # State for the keys the batch touches is loaded once, updated in memory
+    # and written back once.
+    rows = [row for row in rows if row.get("amount")]
+    if not rows:
+        return []
+
+    budgets = {
+        (category, person): limit
+        for category, person, limit in conn.execute(
+            "SELECT category, person, monthly_limit FROM budgets"
+        )
+    }
+
+    month_state = {}
+    stats = {}
+    for row in rows:
+        month = str(row["date"])[:7]
+        for scope in _scopes(row["category"], row["person"]):
+            key = (*scope, month)
+            if key not in month_state:
+                found = conn.execute(
+                    "SELECT amount FROM alert_month_state "
+                    "WHERE category = ? AND person = ? AND month = ?", key
+                ).fetchone()
+                month_state[key] = found[0] if found else 0
+        key = (row["category"], row["person"])
+        if key not in stats:
+            found = conn.execute(
+                "SELECT n, mean, var FROM alert_amount_stats WHERE category = ? AND person = ?", key
+            ).fetchone()
+            stats[key] = list(found) if found else [0, 0.0, 0.0]
+
+    now = datetime.now().isoformat(timespec="seconds")
+    new_alerts = []
+    for row in rows:
+        amount = float(row["amount"])
+        month = str(row["date"])[:7]
+
+        # Monthly budgets: alert when a level is crossed, not on every row after
+        for scope in _scopes(row["category"], row["person"]):
+            key = (*scope, month)
+            before = month_state[key]
+            after = before + amount
+            month_state[key] = after
+            limit = budgets.get(scope)
+            if not limit:
+                continue
+            # Highest level crossed by this row only
+            for level, kind in reversed(BUDGET_LEVELS):
+                threshold = level * float(limit)
+                if before < threshold <= after:
+                    category, person = scope
+                    new_alerts.append((
+                        now, row["date"], kind, category, person, after, limit,
+                        f"{'All' if category == ALL else category} spend for "
+                        f"{'everyone' if person == ALL else person} in {month} is "
+                        f"₹{after:,.0f}, {after / float(limit):.0%} of the ₹{float(limit):,.0f} budget",
+                    ))
+                    break
+
+        # Spikes: far above the recent typical amount for this category/person
+        n, mean, var = stats[(row["category"], row["person"])]
+        if n >= SPIKE_MIN_HISTORY:
+            threshold = mean + SPIKE_SIGMA * math.sqrt(var)
+            if amount > threshold:
+                new_alerts.append((
+                    now, row["date"], "spike", row["category"], row["person"], amount, round(threshold, 2),
+                    f"₹{amount:,.0f} on {row['category']} by {row['person']} is unusually high "
+                    f"(typical ₹{mean:,.0f})",
+                ))
+        diff = amount - mean
+        if n == 0:
+            mean, var = amount, 0.0
+        else:
+            increment = SPIKE_ALPHA * diff
+            mean += increment
+            var = (1 - SPIKE_ALPHA) * (var + diff * increment)
+        stats[(row["category"], row["person"])] = [n + 1, mean, var]
+
+    conn.executemany(
+        "INSERT INTO alert_month_state (category, person, month, amount) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (category, person, month) DO UPDATE SET amount = excluded.amount",
+        [(*key, amount) for key, amount in month_state.items()],
+    )
+    conn.executemany(
+        "INSERT INTO alert_amount_stats (category, person, n, mean, var) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (category, person) DO UPDATE SET "
+        "n = excluded.n, mean = excluded.mean, var = excluded.var",
+        [(*key, *values) for key, values in stats.items()],
+    )
+    if emit and new_alerts:
+        conn.executemany(
+            "INSERT INTO alerts (created_at, date, kind, category, person, amount, threshold, message) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            new_alerts,
+        )
+    return new_alerts
+
+
+# ---------- BUDGETS / OUTBOX ----------
+def set_budget(conn, category, monthly_limit, person=ALL):
+    with conn:
+        if monthly_limit:
+            conn.execute(
+                "INSERT INTO budgets (category, person, monthly_limit) VALUES (?, ?, ?) "
+                "ON CONFLICT (category, person) DO UPDATE SET monthly_limit = excluded.monthly_limit",
+                (category, person, monthly_limit),
+            )
+        else:
+            conn.execute("DELETE FROM budgets WHERE category = ? AND person = ?", (category, person))
+
+
+def list_budgets(conn):
+    return [
+        {"category": category, "person": person, "monthly_limit": limit}
+        for category, person, limit in conn.execute(
+            "SELECT category, person, monthly_limit FROM budgets ORDER BY category, person"
+        )
+    ]
+
+
+ALERT_FIELDS = ["id", "created_at", "date", "kind", "category", "person", "amount", "threshold", "message", "delivered"]
+
+
+def list_alerts(conn, pending_only=False, limit=50):
+    where = "WHERE delivered = 0" if pending_only else ""
+    rows = conn.execute(
+        f"SELECT {', '.join(ALERT_FIELDS)} FROM alerts {where} ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return [dict(zip(ALERT_FIELDS, row)) for row in rows]
+
+
+def mark_delivered(conn, alert_ids):
+    with conn:
+        conn.executemany("UPDATE alerts SET delivered = 1 WHERE id = ?", [(i,) for i in alert_ids])
+
+
+def rebuild(conn, emit=False, batch_size=10000):
+    # Reset the state and replay the whole ledger in date order. With emit,
+    # undelivered alerts are regenerated too; delivered ones are kept.
+    fields = ["date", "person", "amount", "category"]
+    with conn:
+        conn.execute("DELETE FROM alert_month_state")
+        conn.execute("DELETE FROM alert_amount_stats")
+        if emit:
+            conn.execute("DELETE FROM alerts WHERE delivered = 0")
+        cur = conn.execute(f"SELECT {', '.join(fields)} FROM expenses ORDER BY date, id")
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            process_rows(conn, [dict(zip(fields, row)) for row in batch], emit=emit)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import expense_store
+
+    parser = argparse.ArgumentParser(description="Expense budgets and alerts")
+    parser.add_argument("--db", default=expense_store.DB_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+    budget = commands.add_parser("budget", help="set a monthly budget (0 removes it)")
+    budget.add_argument("category", help='category name, or "*" for all spending')
+    budget.add_argument("limit", type=float)
+    budget.add_argument("--person", default=ALL)
+    commands.add_parser("budgets", help="list budgets")
+    listing = commands.add_parser("list", help="show recent alerts")
+    listing.add_argument("--pending", action="store_true")
+    replay = commands.add_parser("rebuild", help="replay history into the alert state")
+    replay.add_argument("--emit", action="store_true", help="also regenerate undelivered alerts")
+    args = parser.parse_args()
+
+    conn = expense_store.get_connection(args.db)
+    if args.command == "budget":
+        set_budget(conn, args.category, args.limit, args.person)
+    elif args.command == "budgets":
+        for b in list_budgets(conn):
+            print(f"{b['category']:<15} {b['person']:<10} ₹{b['monthly_limit']:,}")
+    elif args.command == "list":
+        for a in reversed(list_alerts(conn, pending_only=args.pending)):
+            print(f"#{a['id']} {a['date']} [{a['kind']}] {a['message']}")
+    else:
+        rebuild(conn, emit=args.emit)
+        print("Alert state rebuilt")
@@ -1,23 +1,34 @@
-import streamlit as st
-import pandas as pd
 import os
-import re
-from datetime import datetime
+
+import streamlit as st
+
+import households
+from expense_store import ExpenseStore
 
 # ----------------- BASIC CONFIG -----------------
 st.set_page_config(page_title="Expense Tracker", layout="wide")
 st.title("💰 Personal Expense Tracker (WhatsApp Based)")
 
-DATA_FILE = "expenses.csv"
 
-# ----------------- INIT DATA -----------------
-if not os.path.exists(DATA_FILE):
-    df = pd.DataFrame(columns=[
-        "Date", "Person", "Amount", "Category", "Description"
-    ])
-    df.to_csv(DATA_FILE, index=False)
+# Kept across reruns so its read cache survives widget interactions; one per
+# household, least recently used ones dropped past MAX_OPEN_SHARDS
+@st.cache_resource(max_entries=households.MAX_OPEN_SHARDS)
+def get_store(household):
+    db_path, ledger_root = households.shard_paths(household)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    return ExpenseStore(db_path, ledger_root=ledger_root)
+
+
+household = st.sidebar.text_input("Household", value=households.DEFAULT_HOUSEHOLD)
+try:
+    household = households.normalize_household(household)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+store = get_store(household)
+people = list(store.spend_by("Person").index) or ["You", "Wife"]
 
-df = pd.read_csv(DATA_FILE)
 
 # ----------------- ADD EXPENSE -----------------
 st.subheader("➕ Add Expense")
@@ -29,71 +40,55 @@ with col1:
                          placeholder="Paid 320 for vegetables")
 
 with col2:
-    person = st.selectbox("Who spent?", ["You", "Wife"])
+    person = st.selectbox("Who spent?", people + ["Someone else…"])
+    if person == "Someone else…":
+        person = st.text_input("Name").strip()
 
 if st.button("Save Expense"):
     if text.strip() == "":
         st.error("Please enter expense text")
+    elif not person:
+        st.error("Please enter who spent")
     else:
-        # Extract amount
-        amount_match = re.search(r"\d+", text)
-        amount = int(amount_match.group()) if amount_match else 0
-
-        # Category rules
-        rules = {
-            "uber": "Travel",
-            "ola": "Travel",
-            "bus": "Travel",
-            "train": "Travel",
-            "swiggy": "Food",
-            "zomato": "Food",
-            "lunch": "Food",
-            "dinner": "Food",
-            "vegetable": "Groceries",
-            "milk": "Groceries",
-            "fruit": "Groceries",
-            "electricity": "Bills",
-            "rent": "Bills",
-            "amazon": "Shopping",
-            "flipkart": "Shopping",
-            "doctor": "Medical",
-            "medicine": "Medical"
-        }
-
-        category = "Misc"
-        for key, value in rules.items():
-            if key in text.lower():
-                category = value
-                break
-
-        new_row = {
-            "Date": datetime.now().strftime("%Y-%m-%d"),
-            "Person": person,
-            "Amount": amount,
-            "Category": category,
-            "Description": text
-        }
-
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(DATA_FILE, index=False)
-
-        st.success(f"Saved ₹{amount} under {category}")
+        row = store.add(text, person)
+        if "duplicate_of" in row:
+            st.info("Already saved today, skipped")
+        else:
+            st.success(f"Saved ₹{row['amount']} under {row['category']}")
+
+# ----------------- ALERTS -----------------
+recent_alerts = store.recent_alerts()
+if recent_alerts:
+    st.subheader("🚨 Alerts")
+    for alert in recent_alerts:
+        st.warning(f"{alert['date']}: {alert['message']}")
 
 # ----------------- DASHBOARD -----------------
 st.divider()
 st.subheader("📊 Dashboard")
 
-col1, col2, col3 = st.columns(3)
+columns = st.columns(1 + len(people))
 
-col1.metric("Total Spend", f"₹{df['Amount'].sum()}")
-col2.metric("Your Spend", f"₹{df[df.Person=='You']['Amount'].sum()}")
-col3.metric("Wife Spend", f"₹{df[df.Person=='Wife']['Amount'].sum()}")
+columns[0].metric("Total Spend", f"₹{store.total_spend()}")
+for column, name in zip(columns[1:], people):
+    column.metric(f"{name} Spend", f"₹{store.total_spend(name)}")
 
 st.subheader("📂 Category-wise Spend")
-st.bar_chart(df.groupby("Category")["Amount"].sum())
+st.bar_chart(store.spend_by("Category"))
 
 st.subheader("👫 Person-wise Spend")
-st.bar_chart(df.groupby("Person")["Amount"].sum())
-
-st.subheader("📄 All Expenses")
-st.dataframe(df.sort_values(by="Date", ascending=False))
+st.bar_chart(store.spend_by("Person"))
+
+st.subheader("📅 Month-wise Spend")
+st.bar_chart(store.spend_by("Month"))
+
+# Only the selected month's Parquet partition is read
+st.subheader("📄 Expenses by Month")
+months = list(store.spend_by("Month").index)[::-1]
+if months:
+    month = st.selectbox("Month", months)
+    month_df = store.month_expenses(month)
+    st.caption(f"{len(month_df)} of {store.count()} expenses")
+    st.dataframe(month_df)
+else:
+    st.info("No expenses yet")
@@ -0,0 +1,91 @@
+# Compare the old per-keyword substring loop with the compiled categorizer.
+#
+#   python benchmarks/bench_categorizer.py --rules 10000 50000
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from categorizer import RULES, Categorizer
+
+MESSAGES = [
+    "paid 320 for vegetables",
+    "uber to office 245",
+    "zomato dinner 780",
+    "electricity bill 1450",
+    "gave 200 to maid",
+    "netflix 649",
+    "doctor visit 500 and medicine 320",
+    "petrol 2000",
+]
+
+
+def loop_categorize(text, rules):
+    # The original parse_expense approach
+    text = text.lower()
+    for key, value in rules:
+        if key in text:
+            return value
+    return "Misc"
+
+
+def synthetic_rules(n, seed=7):
+    # Random merchant-like keywords first, the real rules last, so the old
+    # loop has to walk the whole table for typical messages.
+    rng = random.Random(seed)
+    rules = []
+    seen = {key for key, _ in RULES}
+    while len(rules) < n - len(RULES):
+        key = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12)))
+        if key not in seen:
+            seen.add(key)
+            rules.append((key, f"Cat{len(rules) % 40}"))
+    return rules + list(RULES)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(n_rules, n_messages):
+    rules = synthetic_rules(n_rules) if n_rules > len(RULES) else list(RULES)
+    messages = [random.choice(MESSAGES) for _ in range(n_messages)]
+
+    start = time.perf_counter()
+    categorizer = Categorizer(rules)
+    build = time.perf_counter() - start
+
+    expected = [loop_categorize(m, rules) for m in messages]
+    assert [categorizer.categorize(m) for m in messages] == expected
+
+    loop_time = timed(lambda: [loop_categorize(m, rules) for m in messages], 1)
+    ac_time = timed(lambda: [categorizer.categorize(m) for m in messages], 3)
+    series = pd.Series(messages)
+    series_time = timed(lambda: categorizer.categorize_series(series), 3)
+
+    print(
+        f"rules={len(rules):>6}  build={build * 1000:8.1f} ms  "
+        f"loop={n_messages / loop_time:>10,.0f} msg/s  "
+        f"automaton={n_messages / ac_time:>10,.0f} msg/s  "
+        f"series={n_messages / series_time:>12,.0f} msg/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, nargs="+", default=[len(RULES), 1000, 10000, 50000])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    for n in args.rules:
+        run(n, args.messages)
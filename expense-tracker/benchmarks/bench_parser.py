@@ -0,0 +1,55 @@
+# Speed and amount accuracy of parse_expense against the original
+# first-\d+ regex parser, on synthetic labelled messages.
+#
+#   python benchmarks/bench_parser.py --messages 100000
+
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import synthetic
+from categorizer import categorize
+from expense_parser import parse_expense
+
+
+def parse_expense_regex(text):
+    # parse_expense before the lexer
+    text = text.lower()
+    amount_match = re.search(r'\d+', text)
+    amount = int(amount_match.group()) if amount_match else 0
+
+    return {
+        "date": datetime.now().strftime("%Y-%m-%d"),
+        "amount": amount,
+        "category": categorize(text),
+        "description": text
+    }
+
+
+def run(name, parse, labelled):
+    start = time.perf_counter()
+    parsed = [parse(text) for text, _ in labelled]
+    elapsed = time.perf_counter() - start
+    correct = sum(
+        abs(p["amount"] - expected) < 0.01 for p, (_, expected) in zip(parsed, labelled)
+    )
+    print(f"{name:<8} {len(labelled) / elapsed:>12,.0f} msg/s   "
+          f"amount accuracy {correct / len(labelled):7.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    labelled = list(synthetic.labelled_messages(args.messages))
+    today = date.today()
+    run("regex", parse_expense_regex, labelled)
+    run("lexer", lambda text: parse_expense(text, today), labelled)
@@ -0,0 +1,214 @@
+# Parser, storage and dashboard benchmarks for the expense tracker.
+#
+#   python benchmarks/bench_suite.py --out results.json
+#   python benchmarks/bench_suite.py --sizes 1000 100000 --compare results.json
+#
+# Every run writes a JSON file of named measurements; --compare prints the
+# change against an earlier file. Runs use a scratch directory, never the
+# real expenses.db.
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import pandas as pd
+
+import expense_store
+import parquet_ledger
+import synthetic
+from expense_parser import parse_expense
+from expense_store import ExpenseStore
+
+
+SYNC_ROUNDS = 4     # syncs before the compaction benchmark
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+# ---------- PARSER ----------
+def bench_parser(n):
+    texts = list(synthetic.messages(n))
+    elapsed = timed(lambda: [parse_expense(t) for t in texts])
+    return {"parse_expense.msgs_per_sec": n / elapsed}
+
+
+# ---------- WRITES ----------
+def bench_writes(workdir, n):
+    rows = list(synthetic.rows(n))
+    results = {}
+
+    # The original api.py path: open, append one row, close
+    csv_path = os.path.join(workdir, "append.csv")
+
+    def csv_append():
+        for row in rows:
+            with open(csv_path, "a", newline="") as f:
+                csv.writer(f).writerow([row[k] for k in ("date", "amount", "category", "description", "person")])
+
+    results["csv.append_row.rows_per_sec"] = n / timed(csv_append)
+
+    # The original app.py path: concat + rewrite the whole file, sampled
+    # because it is quadratic
+    sample = rows[: min(n, 500)]
+    rewrite_path = os.path.join(workdir, "rewrite.csv")
+    pd.DataFrame(columns=expense_store.COLUMNS).to_csv(rewrite_path, index=False)
+
+    def csv_rewrite():
+        for row in sample:
+            df = pd.read_csv(rewrite_path)
+            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+            df.to_csv(rewrite_path, index=False)
+
+    results["csv.rewrite.rows_per_sec"] = len(sample) / timed(csv_rewrite)
+
+    single_db = os.path.join(workdir, "single.db")
+
+    def sqlite_single():
+        for row in sample:
+            expense_store.add_expense(db_path=single_db, **row)
+
+    results["sqlite.add_expense.rows_per_sec"] = len(sample) / timed(sqlite_single)
+
+    # Rates count rows actually inserted, not rows offered
+    batch_db = os.path.join(workdir, "batch.db")
+    inserted = []
+    elapsed = timed(lambda: inserted.append(expense_store.add_expenses(rows, batch_db)))
+    results["sqlite.add_expenses.rows_per_sec"] = inserted[0] / elapsed
+
+    # Rows arrive and are synced in rounds, so months hold several append
+    # files for compact() to merge, as they do between compactions
+    ledger_db = os.path.join(workdir, "ledger.db")
+    ledger = os.path.join(workdir, "ledger")
+    step = -(-n // SYNC_ROUNDS)
+    synced = elapsed = 0
+    for i in range(0, n, step):
+        expense_store.add_expenses(rows[i:i + step], ledger_db)
+        start = time.perf_counter()
+        synced += parquet_ledger.sync(ledger_db, ledger)
+        elapsed += time.perf_counter() - start
+    results["parquet.sync.rows_per_sec"] = synced / elapsed
+    results["parquet.compact.seconds"] = timed(lambda: parquet_ledger.compact(ledger))
+    return results
+
+
+# ---------- DASHBOARD ----------
+def dashboard_from_frame(df):
+    # What app.py computed on every rerun before the store existed
+    return (
+        df["Amount"].sum(),
+        df[df.Person == "You"]["Amount"].sum(),
+        df[df.Person == "Wife"]["Amount"].sum(),
+        df.groupby("Category")["Amount"].sum(),
+        df.groupby("Person")["Amount"].sum(),
+    )
+
+
+def dashboard_from_store(store, month):
+    return (
+        store.total_spend(),
+        store.total_spend("You"),
+        store.total_spend("Wife"),
+        store.spend_by("Category"),
+        store.spend_by("Person"),
+        store.spend_by("Month"),
+        store.month_expenses(month),
+    )
+
+
+def bench_dashboard(workdir, size):
+    db_path = os.path.join(workdir, f"dash-{size}.db")
+    csv_path = os.path.join(workdir, f"dash-{size}.csv")
+    ledger = os.path.join(workdir, f"ledger-{size}")
+
+    rows = list(synthetic.rows(size))
+    expense_store.add_expenses(rows, db_path)
+    ExpenseStore.to_frame(rows).to_csv(csv_path, index=False)
+    parquet_ledger.sync(db_path, ledger)
+    parquet_ledger.compact(ledger)
+    del rows
+
+    results = {}
+    results[f"dashboard.csv_full_read.{size}.ms"] = 1000 * timed(
+        lambda: dashboard_from_frame(pd.read_csv(csv_path))
+    )
+
+    store = ExpenseStore(db_path, ledger_root=ledger)
+    month = store.spend_by("Month").index[-1]
+    store.invalidate()
+    results[f"dashboard.store_cold.{size}.ms"] = 1000 * timed(lambda: dashboard_from_store(store, month))
+    results[f"dashboard.store_cached.{size}.ms"] = 1000 * timed(lambda: dashboard_from_store(store, month))
+    return results
+
+
+# ---------- RUN / COMPARE ----------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+    print(f"\n{'benchmark':<45} {'before':>14} {'after':>14} {'change':>8}")
+    for name, value in current.items():
+        if name not in previous:
+            continue
+        before = previous[name]
+        change = (value - before) / before * 100 if before else 0
+        print(f"{name:<45} {before:>14,.2f} {value:>14,.2f} {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000, 1_000_000],
+                        help="ledger sizes for the dashboard benchmark")
+    parser.add_argument("--parse-messages", type=int, default=100_000)
+    parser.add_argument("--write-rows", type=int, default=20_000)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    out_path = os.path.abspath(args.out)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as workdir:
+        results.update(bench_parser(args.parse_messages))
+        results.update(bench_writes(workdir, args.write_rows))
+        for size in args.sizes:
+            results.update(bench_dashboard(workdir, size))
+
+    for name, value in results.items():
+        print(f"{name:<45} {value:>14,.2f}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {out_path}")
+
+    if args.compare:
+        compare(results, args.compare)
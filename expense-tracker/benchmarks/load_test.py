@@ -0,0 +1,102 @@
+# Open-loop load test for POST /add-expense.
+#
+# Requests are fired on a fixed schedule (not after the previous one
+# returns), so queueing delay shows up in the latencies.
+#
+#   python benchmarks/load_test.py --rate 1000 --duration 10
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000 --rate 1000
+#
+# Without --url the app runs in-process against a scratch database.
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+MESSAGES = [
+    "Paid 320 for vegetables",
+    "uber 245",
+    "zomato dinner 780",
+    "milk 60",
+    "electricity bill 1450",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def fire(client, latencies, errors, message_id):
+    # A fresh message_id per request, so every one is a new row for the
+    # writer rather than a duplicate of an earlier message
+    payload = {"text": random.choice(MESSAGES), "person": random.choice(["You", "Wife"]),
+               "message_id": message_id}
+    start = time.perf_counter()
+    try:
+        response = await client.post("/add-expense", json=payload)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        errors.append(1)
+        return
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_load(client, rate, duration):
+    latencies, errors, tasks = [], [], []
+    total = int(rate * duration)
+    run = uuid.uuid4().hex[:8]    # ids stay unique across runs against one server
+    start = time.perf_counter()
+
+    for i in range(total):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(client, latencies, errors, f"load-{run}-{i}")))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+async def main(args):
+    if args.url:
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        async with httpx.AsyncClient(base_url=args.url, timeout=30, limits=limits) as client:
+            return await run_load(client, args.rate, args.duration)
+
+    os.chdir(tempfile.mkdtemp(prefix="expense-load-"))
+    import api
+
+    async with api.lifespan(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            result = await run_load(client, args.rate, args.duration)
+        print(f"batches={api.writer.batches_written} rows={api.writer.rows_written}")
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base URL of a running api.py; default runs in-process")
+    parser.add_argument("--rate", type=float, default=1000, help="requests per second")
+    parser.add_argument("--connections", type=int, default=32, help="client connection pool size")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    args = parser.parse_args()
+
+    latencies, errors, elapsed = asyncio.run(main(args))
+    print(f"sent={len(latencies) + len(errors)} errors={len(errors)} "
+          f"achieved={(len(latencies) + len(errors)) / elapsed:.0f} req/s")
+    if latencies:
+        print(f"p50={percentile(latencies, 50):.2f} ms  p99={percentile(latencies, 99):.2f} ms  "
+              f"max={max(latencies):.2f} ms  mean={statistics.mean(latencies):.2f} ms")
@@ -0,0 +1,92 @@
+# Synthetic Indian-household expense messages for benchmarks.
+#
+# Amounts come in the shapes people actually type: "₹1,250.50", "1,25,000",
+# "Rs. 80", "320/-", "2.5k"; merchants mix brand names with Hinglish
+# ("sabziwala", "doodh", "kirana").
+
+import random
+from datetime import date, timedelta
+
+MERCHANTS = [
+    "swiggy", "zomato", "uber", "ola", "rapido", "bigbasket", "blinkit", "zepto",
+    "amazon", "flipkart", "myntra", "dmart", "kirana store", "sabziwala", "doodhwala",
+    "chai tapri", "medical store", "apollo pharmacy", "doctor", "electricity board",
+    "jio recharge", "netflix", "hotstar", "petrol pump", "metro card", "train ticket",
+    "bus pass", "rent", "maid", "dhobi", "school fees", "milk", "fruit wala",
+]
+
+TEMPLATES = [
+    "Paid {amount} for {merchant}",
+    "{merchant} {amount}",
+    "{merchant} ka bill {amount}",
+    "aaj {merchant} se liya {amount}",
+    "kal {merchant} pe {amount} diye",
+    "{amount} {merchant}",
+    "Spent {amount} on {merchant} today",
+    "{merchant} order {amount} (split with Priya)",
+    "{qty} kg tomatoes from {merchant} {amount}",
+]
+
+
+def format_amount(rng, value):
+    # -> (text, the amount a correct parser should read from it)
+    style = rng.randrange(7)
+    if style == 0:
+        return f"₹{value:,.2f}", value
+    if style == 1:
+        return f"Rs. {int(value)}", int(value)
+    if style == 2:
+        return f"{int(value)}/-", int(value)
+    if style == 3:
+        # Indian digit grouping: 1,25,000
+        whole = str(int(value))
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        return (",".join(groups + [tail]) if groups else tail), int(value)
+    if style == 4 and value >= 1000:
+        short = round(value / 1000, 1)
+        return f"{short}k", round(short * 1000)
+    if style == 5:
+        return f"₹{int(value)}", int(value)
+    return str(int(value)), int(value)
+
+
+def labelled_messages(n, seed=42):
+    # -> (message, expected amount)
+    rng = random.Random(seed)
+    for _ in range(n):
+        value = round(rng.lognormvariate(6, 1.2), 2)
+        text, expected = format_amount(rng, value)
+        message = rng.choice(TEMPLATES).format(
+            amount=text,
+            merchant=rng.choice(MERCHANTS),
+            qty=rng.randint(1, 5),
+        )
+        yield message, expected
+
+
+def messages(n, seed=42):
+    for message, _ in labelled_messages(n, seed):
+        yield message
+
+
+def rows(n, seed=42, start=date(2019, 1, 1), days=365 * 6):
+    # Ledger rows ready for expense_store.add_expenses
+    rng = random.Random(seed)
+    categories = ["Food", "Travel", "Groceries", "Bills", "Shopping", "Medical", "Misc"]
+    texts = list(messages(min(n, 5000), seed))
+    for i in range(n):
+        yield {
+            "date": (start + timedelta(days=rng.randrange(days))).isoformat(),
+            "person": rng.choice(["You", "Wife"]),
+            "amount": round(rng.lognormvariate(6, 1.2), 2),
+            "category": rng.choice(categories),
+            # Numbered so no two rows share expense_store's dedup key
+            # (text, person, date) and every generated row is inserted
+            "description": f"{texts[i % len(texts)]} #{i}",
+        }
@@ -0,0 +1,136 @@
+import csv
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CATEGORY = "Misc"
+
+# Up to this many rules, one C-level substring check per keyword beats
+# walking the automaton character by character in Python
+SMALL_RULESET = 64
+
+# Keyword -> category, in priority order. When a message contains several
+# keywords, the one listed first wins (same as the old dict loop).
+RULES = [
+    ("uber", "Travel"),
+    ("ola", "Travel"),
+    ("bus", "Travel"),
+    ("train", "Travel"),
+    ("swiggy", "Food"),
+    ("zomato", "Food"),
+    ("dinner", "Food"),
+    ("lunch", "Food"),
+    ("breakfast", "Food"),
+    ("vegetable", "Groceries"),
+    ("milk", "Groceries"),
+    ("fruit", "Groceries"),
+    ("electricity", "Bills"),
+    ("rent", "Bills"),
+    ("netflix", "Entertainment"),
+    ("amazon", "Shopping"),
+    ("flipkart", "Shopping"),
+    ("doctor", "Medical"),
+    ("medicine", "Medical"),
+]
+
+
+def load_rules(path):
+    # CSV with a "keyword,category" header; row order is priority order
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["keyword"], row["category"]) for row in csv.DictReader(f)]
+
+
+# Aho-Corasick automaton over all rule keywords. A message is scanned once,
+# character by character, whatever the number of rules. Every state stores the
+# best (lowest) rule priority among the keywords ending there, so the scan
+# only keeps a running minimum.
+class Categorizer:
+    def __init__(self, rules=RULES, default=DEFAULT_CATEGORY):
+        self.default = default
+        self.categories = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [len(rules)]
+
+        for priority, (keyword, category) in enumerate(rules):
+            self.categories.append(category)
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(len(rules))
+                state = nxt
+            self._best[state] = min(self._best[state], priority)
+
+        self._build_failure_links()
+        self._no_match = len(rules)
+        self._keywords = [keyword.lower() for keyword, _ in rules] if len(rules) <= SMALL_RULESET else None
+
+    def _build_failure_links(self):
+        # Breadth-first, so a state's failure target is finished before it
+        # and its best priority can be folded in.
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._best[nxt] = min(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+
+    def match(self, text):
+        # Priority of the winning rule, or None when nothing matches
+        if self._keywords is not None:
+            text = text.lower()
+            for priority, keyword in enumerate(self._keywords):
+                if keyword and keyword in text:
+                    return priority
+            return None
+
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = self._no_match
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break
+        return None if best == self._no_match else best
+
+    def categorize(self, text):
+        priority = self.match(text)
+        return self.default if priority is None else self.categories[priority]
+
+    def categorize_series(self, series):
+        # Re-categorize a whole column. Ledger descriptions repeat a lot, so
+        # each distinct text is scanned once and the result broadcast back.
+        # (the trailing default also covers factorize's -1 code)
+        codes, uniques = pd.factorize(series.fillna("").astype(str))
+        labels = np.array([self.categorize(text) for text in uniques] + [self.default], dtype=object)
+        return pd.Series(labels[codes], index=series.index, name="Category")
+
+
+_default = Categorizer()
+
+
+def categorize(text):
+    return _default.categorize(text)
+
+
+def categorize_series(series):
+    return _default.categorize_series(series)
@@ -1,45 +1,193 @@
 import re
-from datetime import datetime
-
-def parse_expense(text):
-    text = text.lower()
-
-    # Extract amount
-    amount_match = re.search(r'\d+', text)
-    amount = int(amount_match.group()) if amount_match else 0
-
-    # Category rules
-    categories = {
-        "uber": "Travel",
-        "ola": "Travel",
-        "bus": "Travel",
-        "train": "Travel",
-        "swiggy": "Food",
-        "zomato": "Food",
-        "dinner": "Food",
-        "lunch": "Food",
-        "breakfast": "Food",
-        "vegetable": "Groceries",
-        "milk": "Groceries",
-        "fruit": "Groceries",
-        "electricity": "Bills",
-        "rent": "Bills",
-        "netflix": "Entertainment",
-        "amazon": "Shopping",
-        "flipkart": "Shopping",
-        "doctor": "Medical",
-        "medicine": "Medical"
-    }
+from datetime import date, timedelta
+
+from categorizer import categorize
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10,
+    "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_MONTH_INITIALS = "".join(sorted({name[0] for name in MONTHS}))
+
+# Days relative to the message date; "kal" in an expense note means yesterday
+RELATIVE_DAYS = {"today": 0, "aaj": 0, "yesterday": -1, "kal": -1, "parso": -2}
+
+UNITS = {
+    "kg", "kgs", "g", "gm", "gms", "gram", "grams", "l", "ltr", "litre", "liter",
+    "litres", "liters", "ml", "pc", "pcs", "piece", "pieces", "dozen", "packet",
+    "packets", "pkt", "plate", "plates", "x",
+}
+
+# Words that never name the merchant
+FILLER_WORDS = {
+    "paid", "pay", "spent", "spend", "bought", "buy", "for", "on", "at", "to", "from",
+    "the", "a", "an", "and", "of", "with", "my", "our", "bill", "order", "rs", "inr",
+    "rupees", "rupee", "today", "yesterday", "aaj", "kal", "parso", "se", "pe", "ka",
+    "ki", "ke", "ko", "liya", "liye", "diya", "diye", "total", "amount", "split", "via",
+}
+NOT_MERCHANT = FILLER_WORDS | UNITS
+MERCHANT_BEFORE = {"se", "pe", "ka", "ki", "ke"}    # "swiggy se", "dmart ka bill"
+MERCHANT_AFTER = {"at", "from", "to", "on", "for", "via"}    # "paid at dmart"
+
+# The tokens of a message. Alternatives are tried left to right at each
+# position, so the more specific shapes (currency amounts, dates) come first.
+# Each alternative is wrapped in an upper-case group; m.lastgroup names it.
+# The lookaheads skip the currency and month alternatives at letters they
+# can't start with, so the engine doesn't try every alternative everywhere.
+_TOKENS = r"""
+    (?P<CUR>(?=[₹ri])(?:₹|\brs\b\.?|\binr\b)\s*(?P<camount>\d+(?:,\d+)*(?:\.\d+)?)(?P<ck>k\b)?)
+  | (?P<DMY>(?P<dd>\d{1,2})[/-](?P<dm>\d{1,2})(?:[/-](?P<dy>\d{4}|\d{2}))?\b(?!/-))
+  | (?P<DMON>(?P<day>\d{1,2})(?:st|nd|rd|th)?\s*(?P<mon>""" + _MONTH_NAMES + r""")\b)
+  | (?P<MOND>(?=[""" + _MONTH_INITIALS + r"""])(?P<mon2>""" + _MONTH_NAMES + r""")\s*(?P<day2>\d{1,2})(?:st|nd|rd|th)?\b)
+  | (?P<NUM>(?P<number>\d+(?:,\d+)*(?:\.\d+)?)(?P<nk>k\b)?\s*(?P<suffix>/-|\brs\b\.?|\brupees?\b|\binr\b)?)
+  | (?P<WORD>[^\W\d_]+)
+"""
+TOKEN_RE = re.compile(r"\s*(?:" + _TOKENS + ")", re.VERBOSE)
+# The same tokens as plain strings. findall builds no match object per
+# token, and most tokens are words that need nothing more; only the others
+# are matched again with TOKEN_RE for their parts.
+TOKEN_TEXT_RE = re.compile(r"\s*(" + re.sub(r"\(\?P<\w+>", "(?:", _TOKENS) + ")", re.VERBOSE)
+
+
+def _to_number(digits, thousands):
+    if thousands or "." in digits:
+        value = float(digits.replace(",", ""))
+        if thousands:
+            value *= 1000
+        return int(value) if value.is_integer() else value
+    return int(digits.replace(",", ""))
+
+
+def _resolve_date(day, month, year, today):
+    if year is None:
+        year = today.year
+        candidate = date(year, month, day)
+        # "28 Dec" written in January is last year's
+        return candidate if candidate <= today else date(year - 1, month, day)
+    if year < 100:
+        year += 2000
+    return date(year, month, day)
 
-    category = "Misc"
-    for key, value in categories.items():
-        if key in text:
-            category = value
-            break
+
+def lex_expense(text, today=None):
+    # Compact record of everything the message says:
+    # (amount, date, quantity, unit, merchant), from a single walk over the
+    # message. Expects lower-case text; parse_expense lowers it once for the
+    # lexer and the categorizer.
+    today = today or date.today()
+
+    amount = None        # an explicit currency amount wins outright
+    first_number = None  # otherwise the first number that isn't a quantity
+    spare_number = None  # or, failing both, the day of a date that isn't one
+    pending = None       # a bare number waiting to see if a unit follows
+    quantity = unit = None
+    when = None
+    merchant = None
+    fallback_merchant = None
+    previous_word = None
+    after_preposition = False
+
+    tokens = TOKEN_TEXT_RE.findall(text)
+    for i, token in enumerate(tokens):
+        # Plain words and bare integers are told apart without a regex
+        if token.isalpha():
+            kind = "WORD"
+        elif token.isdecimal():
+            kind = "INT"
+        else:
+            m = TOKEN_RE.match(token)
+            kind = m.lastgroup
+
+        if kind == "WORD":
+            word = token
+            if pending is not None:
+                if word in UNITS and quantity is None:
+                    quantity, unit = pending, word
+                elif first_number is None:
+                    first_number = pending
+                pending = None
+            if word in RELATIVE_DAYS:
+                if when is None:
+                    when = today + timedelta(days=RELATIVE_DAYS[word])
+            elif merchant is None:
+                if word in MERCHANT_BEFORE and previous_word and previous_word not in NOT_MERCHANT:
+                    merchant = previous_word
+                elif after_preposition and word not in NOT_MERCHANT:
+                    merchant = word
+                elif fallback_merchant is None and word not in NOT_MERCHANT:
+                    fallback_merchant = word
+            after_preposition = word in MERCHANT_AFTER
+            previous_word = word
+            continue
+
+        if pending is not None:
+            if first_number is None:
+                first_number = pending
+            pending = None
+        previous_word = None
+        after_preposition = False
+
+        if kind == "INT":
+            pending = int(token)
+        elif kind == "NUM":
+            value = _to_number(m["number"], m["nk"])
+            if m["suffix"]:
+                if amount is None:
+                    amount = value
+            else:
+                pending = value
+        elif kind == "CUR":
+            if amount is None:
+                amount = _to_number(m["camount"], m["ck"])
+        elif kind == "DMY" and not m["dy"] and "/" in token and int(m["dm"]) \
+                and i + 1 < len(tokens) and tokens[i + 1] in UNITS:
+            # "1/2 kg" is half a kilo, not the 1st of February
+            value = int(m["dd"]) / int(m["dm"])
+            pending = int(value) if value.is_integer() else value
+        else:
+            try:
+                if kind == "DMY":
+                    found = _resolve_date(int(m["dd"]), int(m["dm"]), int(m["dy"]) if m["dy"] else None, today)
+                elif kind == "DMON":
+                    found = _resolve_date(int(m["day"]), MONTHS[m["mon"]], None, today)
+                else:
+                    found = _resolve_date(int(m["day2"]), MONTHS[m["mon2"]], None, today)
+            except ValueError:
+                # Not a real date, e.g. the range in "paid 50-60 for milk" or
+                # "29 feb" in a year without one: its number is the amount
+                # only if the message has no other
+                if spare_number is None:
+                    spare_number = int(m["dd"] or m["day"] or m["day2"])
+                continue
+            if when is None:
+                when = found
+
+    if pending is not None and first_number is None:
+        first_number = pending
+    if amount is None:
+        for number in (first_number, spare_number, 0):
+            if number is not None:
+                amount = number
+                break
+
+    return amount, when or today, quantity, unit, merchant or fallback_merchant
+
+
+def parse_expense(text, today=None):
+    # today: the date the message was sent, for "yesterday", "12 Jan" etc.
+    lowered = text.lower()
+    amount, when, quantity, unit, merchant = lex_expense(lowered, today)
 
     return {
-        "date": datetime.now().strftime("%Y-%m-%d"),
+        "date": when.isoformat(),
         "amount": amount,
-        "category": category,
-        "description": text
+        "category": categorize(lowered),
+        "description": lowered,
+        "quantity": quantity,
+        "unit": unit,
+        "merchant": merchant,
     }
+
@@ -0,0 +1,672 @@
+import csv
+import hashlib
+import os
+import sqlite3
+import threading
+import weakref
+
+import pandas as pd
+
+import alerts
+
+DB_FILE = "expenses.db"
+LEGACY_CSV_FILE = "expenses.csv"
+
+# fsync policy for commits (SQLite "synchronous" pragma):
+#   FULL   - fsync the WAL on every commit; an acknowledged write survives
+#            power loss (default)
+#   NORMAL - fsync only at checkpoints; a crash can drop the last commits
+#            but never corrupts the database
+#   OFF    - leave flushing to the OS
+SYNC_MODE = os.environ.get("EXPENSE_DB_SYNC", "FULL").upper()
+if SYNC_MODE not in ("OFF", "NORMAL", "FULL"):
+    raise ValueError(f"EXPENSE_DB_SYNC must be OFF, NORMAL or FULL, not {SYNC_MODE!r}")
+
+COLUMNS = ["Date", "Person", "Amount", "Category", "Description"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    person TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    dedup_key TEXT
+);
+-- (date, id) / (person, date, id) / (category, date, id) serve the date
+-- range filters and keyset pagination of query_expenses
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+DROP INDEX IF EXISTS idx_expenses_person;
+DROP INDEX IF EXISTS idx_expenses_category;
+CREATE INDEX IF NOT EXISTS idx_expenses_person_date ON expenses(person, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses(category, date);
+
+-- Running totals kept up to date by triggers, so every writer (app.py,
+-- api.py, imports) maintains them in the same transaction as the row.
+CREATE TABLE IF NOT EXISTS expense_totals (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    amount NUMERIC NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
+
+-- Resume points for bulk imports, committed together with the rows
+CREATE TABLE IF NOT EXISTS import_progress (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL
+);
+"""
+
+# dimension -> SQL expression over an expenses row
+TOTAL_DIMENSIONS = {
+    "all": "''",
+    "person": "{row}.person",
+    "category": "{row}.category",
+    "day": "{row}.date",
+    "month": "substr({row}.date, 1, 7)",
+}
+
+TOTALS_VERSION = 1
+ALERTS_VERSION = 2
+DEDUP_VERSION = 3
+
+# Added after the first databases were created, so it is set up separately
+DEDUP_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_dedup ON expenses(dedup_key)"
+DEDUP_LOOKUP_CHUNK = 500
+
+
+def _totals_upserts(row, sign):
+    return "\n".join(
+        f"""    INSERT INTO expense_totals (dimension, key, amount, count)
+    VALUES ('{dimension}', {expr.format(row=row)}, {sign}{row}.amount, {sign}1)
+    ON CONFLICT (dimension, key) DO UPDATE SET
+        amount = amount + excluded.amount, count = count + excluded.count;"""
+        for dimension, expr in TOTAL_DIMENSIONS.items()
+    )
+
+
+TOTALS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS expense_totals_insert AFTER INSERT ON expenses
+BEGIN
+{_totals_upserts("NEW", "")}
+END;
+CREATE TRIGGER IF NOT EXISTS expense_totals_delete AFTER DELETE ON expenses
+BEGIN
+{_totals_upserts("OLD", "-")}
+END;
+CREATE TRIGGER IF NOT EXISTS expense_totals_update AFTER UPDATE ON expenses
+BEGIN
+{_totals_upserts("OLD", "-")}
+{_totals_upserts("NEW", "")}
+END;
+"""
+
+_local = threading.local()
+# Live connections get_connection opened, by file, so close_connections can
+# close them from any thread. A thread notices its cached connection was
+# closed by the generation number changing.
+_open_connections = {}  # db_path -> WeakSet
+_generations = {}
+_registry_lock = threading.Lock()
+
+
+# ---------- CONNECTION ----------
+class _Connection(sqlite3.Connection):
+    # sqlite3.Connection itself can't be weakly referenced
+    pass
+
+
+def open_connection(db_path=DB_FILE):
+    # A fresh, unshared connection (long-running streaming reads use these)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, factory=_Connection)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNC_MODE}")
+    return conn
+
+
+def get_connection(db_path=DB_FILE):
+    # One connection per thread and database file. Streamlit reruns and
+    # FastAPI worker threads each reuse theirs instead of reopening.
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    generation = _generations.get(db_path, 0)
+    cached = connections.get(db_path)
+    conn = cached[0] if cached and cached[1] == generation else None
+    if conn is None:
+        conn = open_connection(db_path)
+        with _registry_lock:
+            _open_connections.setdefault(db_path, weakref.WeakSet()).add(conn)
+        conn.executescript(SCHEMA)
+        conn.executescript(TOTALS_TRIGGERS)
+        conn.executescript(alerts.SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(expenses)")]
+        if "dedup_key" not in columns:
+            conn.execute("ALTER TABLE expenses ADD COLUMN dedup_key TEXT")
+        conn.execute(DEDUP_INDEX)
+        connections[db_path] = (conn, generation)
+        _migrate_legacy_csv(conn, db_path)
+        # Databases created before the totals / alert state / dedup keys
+        # existed get them filled once
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < TOTALS_VERSION:
+            rebuild_totals(db_path)
+        if version < ALERTS_VERSION:
+            alerts.rebuild(conn)
+        if version < DEDUP_VERSION:
+            # Key existing rows but keep any duplicates already in the
+            # ledger; `python expense_store.py dedupe` removes those
+            dedupe(db_path, delete=False)
+            conn.execute(f"PRAGMA user_version={DEDUP_VERSION}")
+    return conn
+
+
+def close_connections(db_path=DB_FILE):
+    # Close every thread's cached connection to db_path, e.g. when a
+    # household shard is evicted. Callers make sure none is in use.
+    with _registry_lock:
+        _generations[db_path] = _generations.get(db_path, 0) + 1
+        connections = _open_connections.pop(db_path, ())
+        for conn in list(connections):
+            conn.close()
+
+
+def _migrate_legacy_csv(conn, db_path):
+    # Import the old expenses.csv once, the first time the database is
+    # created next to it. The header is used to map columns, so both the
+    # app.py and api.py column orders load correctly.
+    csv_path = os.path.join(os.path.dirname(db_path), LEGACY_CSV_FILE)
+    if not os.path.exists(csv_path):
+        return
+    if conn.execute("SELECT 1 FROM expenses LIMIT 1").fetchone():
+        return
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = [
+            {
+                "date": row.get("Date", ""),
+                "person": row.get("Person", ""),
+                "amount": row.get("Amount") or 0,
+                "category": row.get("Category") or "Misc",
+                "description": row.get("Description", ""),
+            }
+            for row in csv.DictReader(f)
+        ]
+    add_expenses(rows, db_path)
+
+
+# ---------- DEDUPLICATION ----------
+# Webhook retries and forwarded messages must not be counted twice. Every
+# row gets an idempotency key, unique in the expenses table:
+#   - the client's message id, when it sends one ("message_id" in the row)
+#   - otherwise a hash of the normalized text, the person and the day, so
+#     the same message from the same person on the same day is one expense
+# Clients that send message ids can record two identical expenses in a day;
+# without ids, the second one needs different wording.
+def dedup_key(row):
+    if row.get("message_id"):
+        return f"msg:{row['message_id']}"
+    text = " ".join(str(row["description"]).lower().split())
+    digest = hashlib.sha1(f"{text}\x1f{row['person']}\x1f{row['date']}".encode()).hexdigest()
+    return f"txt:{digest}"
+
+
+def _existing_keys(conn, keys):
+    # key -> id of the row already holding it, one indexed lookup per key
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), DEDUP_LOOKUP_CHUNK):
+        chunk = keys[i:i + DEDUP_LOOKUP_CHUNK]
+        found.update(conn.execute(
+            f"SELECT dedup_key, id FROM expenses WHERE dedup_key IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        ))
+    return found
+
+
+def dedupe(db_path=DB_FILE, delete=True, dry_run=False, batch_size=10000):
+    # Walk rows without a key in id order, a batch at a time. The first row
+    # with a given key keeps it; later copies are duplicates, deleted when
+    # delete is set. Returns [(duplicate_id, original_id)].
+    conn = get_connection(db_path)
+    duplicates = []
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            "SELECT id, date, person, description FROM expenses "
+            "WHERE id > ? AND dedup_key IS NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        keyed = [
+            (expense_id, dedup_key({"date": date, "person": person, "description": description}))
+            for expense_id, date, person, description in batch
+        ]
+        owners = _existing_keys(conn, {key for _, key in keyed})
+        updates = []
+        for expense_id, key in keyed:
+            if key in owners:
+                duplicates.append((expense_id, owners[key]))
+            else:
+                owners[key] = expense_id
+                updates.append((key, expense_id))
+        conn.executemany("UPDATE expenses SET dedup_key = ? WHERE id = ?", updates)
+
+    if delete and duplicates:
+        # The totals triggers take the deleted amounts back out
+        conn.executemany("DELETE FROM expenses WHERE id = ?", [(d,) for d, _ in duplicates])
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return duplicates
+
+
+# ---------- WRITES ----------
+def add_expense(date, person, amount, category, description, db_path=DB_FILE, message_id=None):
+    # Returns the new row's id, or the existing id if this is a repeat
+    row = {"date": date, "person": person, "amount": amount,
+           "category": category, "description": description, "message_id": message_id}
+    add_expenses([row], db_path)
+    if "duplicate_of" in row:
+        return row["duplicate_of"]
+    key = dedup_key(row)
+    return _existing_keys(get_connection(db_path), [key])[key]
+
+
+def add_expenses(rows, db_path=DB_FILE, progress=None):
+    # rows: iterable of dicts with date/person/amount/category/description
+    #       and optionally message_id
+    # progress: optional (source, byte_offset) saved in the same transaction
+    # Rows already in the ledger, or repeated within the batch, are skipped
+    # and marked with row["duplicate_of"] = id of the saved row. Returns the
+    # number of rows inserted.
+    rows = list(rows)
+    keys = [dedup_key(row) for row in rows]
+    conn = get_connection(db_path)
+    with conn:
+        owners = _existing_keys(conn, set(keys))
+        new_rows = []
+        repeats = []
+        batch_keys = set()
+        for row, key in zip(rows, keys):
+            if key in owners:
+                row["duplicate_of"] = owners[key]
+            elif key in batch_keys:
+                repeats.append((row, key))
+            else:
+                batch_keys.add(key)
+                new_rows.append({**row, "dedup_key": key})
+
+        # ON CONFLICT covers a writer in another process that saved the same
+        # key between the lookup and the insert
+        cur = conn.executemany(
+            "INSERT INTO expenses (date, person, amount, category, description, dedup_key) "
+            "VALUES (:date, :person, :amount, :category, :description, :dedup_key) "
+            "ON CONFLICT (dedup_key) DO NOTHING",
+            new_rows,
+        )
+        if repeats:
+            inserted = _existing_keys(conn, {key for _, key in repeats})
+            for row, key in repeats:
+                row["duplicate_of"] = inserted[key]
+        alerts.process_rows(conn, new_rows)
+        if progress is not None:
+            conn.execute(
+                "INSERT INTO import_progress (source, byte_offset) VALUES (?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET byte_offset = excluded.byte_offset",
+                progress,
+            )
+    return cur.rowcount
+
+
+def get_import_offset(source, db_path=DB_FILE):
+    conn = get_connection(db_path)
+    row = conn.execute(
+        "SELECT byte_offset FROM import_progress WHERE source = ?", (source,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+# ---------- TOTALS ----------
+def _compute_totals(conn):
+    totals = {}
+    for dimension, expr in TOTAL_DIMENSIONS.items():
+        key_sql = expr.format(row="expenses")
+        for key, amount, count in conn.execute(
+            f"SELECT {key_sql}, SUM(amount), COUNT(*) FROM expenses GROUP BY 1"
+        ):
+            totals[(dimension, key)] = (amount, count)
+    return totals
+
+
+def rebuild_totals(db_path=DB_FILE):
+    # Recompute every running total from the expenses table
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("DELETE FROM expense_totals")
+        conn.executemany(
+            "INSERT INTO expense_totals (dimension, key, amount, count) VALUES (?, ?, ?, ?)",
+            [(dim, key, amount, count) for (dim, key), (amount, count) in _compute_totals(conn).items()],
+        )
+
+
+def verify_totals(db_path=DB_FILE):
+    # Compare the stored totals with a full recompute; returns the mismatches
+    # as (dimension, key, stored, expected) with (amount, count) pairs
+    conn = get_connection(db_path)
+    with conn:
+        expected = _compute_totals(conn)
+        stored = {
+            (dim, key): (amount, count)
+            for dim, key, amount, count in conn.execute(
+                "SELECT dimension, key, amount, count FROM expense_totals WHERE count != 0"
+            )
+        }
+
+    mismatches = []
+    for dim_key in sorted(set(expected) | set(stored)):
+        want = expected.get(dim_key, (0, 0))
+        have = stored.get(dim_key, (0, 0))
+        if want[1] != have[1] or abs(want[0] - have[0]) > 1e-6:
+            mismatches.append((*dim_key, have, want))
+    return mismatches
+
+
+# ---------- READS ----------
+def load_expenses(limit=None, db_path=DB_FILE):
+    conn = get_connection(db_path)
+    query = (
+        "SELECT date AS Date, person AS Person, amount AS Amount, "
+        "category AS Category, description AS Description "
+        "FROM expenses ORDER BY date DESC, id DESC"
+    )
+    params = ()
+    if limit is not None:
+        query += " LIMIT ?"
+        params = (int(limit),)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+EXPENSE_FIELDS = ["id", "date", "person", "amount", "category", "description"]
+
+
+def _filter_sql(start=None, end=None, category=None, person=None, text=None):
+    # Dates are inclusive ISO strings
+    clauses, params = [], []
+    if start:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end:
+        clauses.append("date <= ?")
+        params.append(end)
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if person:
+        clauses.append("person = ?")
+        params.append(person)
+    if text:
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append("description LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    return clauses, params
+
+
+def encode_cursor(date, expense_id):
+    return f"{date}|{expense_id}"
+
+
+def decode_cursor(cursor):
+    date, _, expense_id = cursor.rpartition("|")
+    if not date:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return date, int(expense_id)
+
+
+def query_expenses(start=None, end=None, category=None, person=None, text=None,
+                   cursor=None, limit=100, db_path=DB_FILE):
+    # One page of expenses in (date, id) order. Keyset pagination: the cursor
+    # is the last (date, id) seen, so every page is an index seek rather than
+    # an OFFSET scan. Returns (rows, next_cursor); next_cursor is None at the end.
+    clauses, params = _filter_sql(start, end, category, person, text)
+    if cursor:
+        clauses.append("(date, id) > (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = get_connection(db_path)
+    rows = conn.execute(
+        f"SELECT {', '.join(EXPENSE_FIELDS)} FROM expenses {where} "
+        "ORDER BY date, id LIMIT ?",
+        (*params, limit + 1),
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return [dict(zip(EXPENSE_FIELDS, row)) for row in rows], next_cursor
+
+
+def summarize(dimension, start=None, end=None, category=None, person=None, db_path=DB_FILE):
+    # Totals by month/category/person/day. Unfiltered summaries come straight
+    # from expense_totals; filtered ones aggregate over the index range.
+    if dimension not in TOTAL_DIMENSIONS or dimension == "all":
+        raise ValueError(f"Unknown summary dimension: {dimension}")
+    conn = get_connection(db_path)
+
+    if not any([start, end, category, person]):
+        rows = conn.execute(
+            "SELECT key, amount, count FROM expense_totals "
+            "WHERE dimension = ? AND count != 0 ORDER BY key",
+            (dimension,),
+        ).fetchall()
+    else:
+        clauses, params = _filter_sql(start, end, category, person)
+        key_sql = TOTAL_DIMENSIONS[dimension].format(row="expenses")
+        rows = conn.execute(
+            f"SELECT {key_sql}, SUM(amount), COUNT(*) FROM expenses "
+            f"WHERE {' AND '.join(clauses)} GROUP BY 1 ORDER BY 1",
+            params,
+        ).fetchall()
+    return [{"key": key, "amount": amount, "count": count} for key, amount, count in rows]
+
+
+def total_spend(person=None, db_path=DB_FILE):
+    # Single primary-key lookup in expense_totals, whatever the ledger size
+    conn = get_connection(db_path)
+    if person is None:
+        key = ("all", "")
+    else:
+        key = ("person", person)
+    row = conn.execute(
+        "SELECT amount FROM expense_totals WHERE dimension = ? AND key = ?", key
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def spend_by(column, db_path=DB_FILE):
+    # column: "Category", "Person", "Day" or "Month"
+    dimension = column.lower()
+    if dimension not in TOTAL_DIMENSIONS or dimension == "all":
+        raise ValueError(f"Unknown spend dimension: {column}")
+    conn = get_connection(db_path)
+    rows = conn.execute(
+        "SELECT key, amount FROM expense_totals "
+        "WHERE dimension = ? AND count != 0 ORDER BY key",
+        (dimension,),
+    ).fetchall()
+    return pd.Series(
+        [total for _, total in rows],
+        index=pd.Index([key for key, _ in rows], name=column),
+        name="Amount",
+    )
+
+
+def count_expenses(db_path=DB_FILE):
+    conn = get_connection(db_path)
+    row = conn.execute(
+        "SELECT count FROM expense_totals WHERE dimension = 'all'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+# ---------- SHARED STORE ----------
+# The one place that knows how a message becomes a ledger row and how rows
+# are read back. app.py and api.py both go through it.
+#
+# Dashboard reads are cached in-process and keyed by SQLite's data_version,
+# which changes whenever any other connection (another thread, the API
+# process, an import) commits. A Streamlit rerun that did not change data is
+# answered from memory without touching the database.
+class ExpenseStore:
+    def __init__(self, db_path=DB_FILE, ledger_root=None):
+        self.db_path = db_path
+        self.ledger_root = ledger_root
+        self._cache = {}
+        self._cache_version = None
+        self._lock = threading.Lock()
+        get_connection(db_path)  # create/migrate the schema up front
+        self._version_conn = open_connection(db_path)
+
+    # ----- schema / parsing -----
+    @staticmethod
+    def parse(text, person, today=None):
+        # Message text -> ledger row (lower-case keys, see COLUMNS).
+        # today: when the message was sent, for relative dates in it
+        from expense_parser import parse_expense
+
+        parsed = parse_expense(text, today)
+        return {
+            "date": parsed["date"],
+            "person": person,
+            "amount": parsed["amount"],
+            "category": parsed["category"],
+            "description": text.strip(),
+        }
+
+    @staticmethod
+    def to_frame(rows):
+        # Ledger rows -> DataFrame with the display COLUMNS
+        return pd.DataFrame(
+            [[row[column.lower()] for column in COLUMNS] for row in rows],
+            columns=COLUMNS,
+        )
+
+    # ----- writes -----
+    def add(self, text, person):
+        row = self.parse(text, person)
+        self.add_rows([row])
+        return row
+
+    def add_rows(self, rows, progress=None):
+        count = add_expenses(rows, self.db_path, progress)
+        self.invalidate()
+        return count
+
+    def close(self):
+        with self._lock:
+            self._version_conn.close()
+            self._cache.clear()
+        close_connections(self.db_path)
+
+    # ----- cache -----
+    def version(self):
+        with self._lock:
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._cache_version = None
+
+    def _cached(self, key, compute):
+        version = self.version()
+        with self._lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+            if key in self._cache:
+                return self._cache[key]
+        value = compute()
+        with self._lock:
+            if self._cache_version == version:
+                self._cache[key] = value
+        return value
+
+    # ----- reads -----
+    def total_spend(self, person=None):
+        return self._cached(("total", person), lambda: total_spend(person, self.db_path))
+
+    def spend_by(self, column):
+        return self._cached(("spend_by", column), lambda: spend_by(column, self.db_path))
+
+    def count(self):
+        return self._cached(("count",), lambda: count_expenses(self.db_path))
+
+    def summarize(self, dimension):
+        return self._cached(("summary", dimension), lambda: summarize(dimension, db_path=self.db_path))
+
+    def recent_alerts(self, limit=5):
+        return self._cached(
+            ("alerts", limit), lambda: alerts.list_alerts(get_connection(self.db_path), limit=limit)
+        )
+
+    def month_expenses(self, month):
+        # "YYYY-MM" -> DataFrame of that month, read from its Parquet partition
+        def compute():
+            import parquet_ledger
+
+            root = self.ledger_root or parquet_ledger.LEDGER_DIR
+            parquet_ledger.sync(self.db_path, root)
+            start, end = parquet_ledger.month_range(int(month[:4]), int(month[5:7]))
+            table = parquet_ledger.read_ledger(start, end, root=root)
+            return self.to_frame(table.to_pylist()).sort_values(by="Date", ascending=False)
+
+        return self._cached(("month", month), compute)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the expense database")
+    parser.add_argument("command", choices=["rebuild-totals", "verify-totals", "dedupe"])
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--ledger", help="dedupe: Parquet ledger of --db (default: the household's own)")
+    parser.add_argument("--dry-run", action="store_true", help="dedupe: only report duplicates")
+    args = parser.parse_args()
+
+    if args.command == "dedupe":
+        duplicates = dedupe(args.db, dry_run=args.dry_run)
+        for duplicate_id, original_id in duplicates:
+            print(f"#{duplicate_id} duplicates #{original_id}")
+        if duplicates and not args.dry_run:
+            # Derived state still includes the deleted rows. The ledger is
+            # the one belonging to --db, never another household's.
+            import households
+            import parquet_ledger
+
+            alerts.rebuild(get_connection(args.db))
+            ledger = args.ledger or households.ledger_for(args.db)
+            if ledger and os.path.isdir(ledger):
+                parquet_ledger.rebuild(args.db, ledger)
+            elif ledger is None:
+                print("No ledger known for this database; pass --ledger to rebuild one")
+        verb = "Found" if args.dry_run else "Removed"
+        print(f"{verb} {len(duplicates)} duplicate expenses")
+    elif args.command == "rebuild-totals":
+        rebuild_totals(args.db)
+        print("Totals rebuilt")
+    else:
+        mismatches = verify_totals(args.db)
+        for dimension, key, stored, expected in mismatches:
+            print(f"{dimension}={key!r}: stored {stored}, expected {expected}")
+        print("Totals OK" if not mismatches else f"{len(mismatches)} mismatched totals")
+        raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,239 @@
+# One database per household, so households never share a write lock, a
+# write queue or a cache.
+#
+#   households/<household>/expenses.db
+#   households/<household>/ledger/          (Parquet copy)
+#
+# The "default" household is the original single-tenant expenses.db and
+# ledger/, so existing data and clients keep working without a household.
+#
+#   python households.py summary
+
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import expense_store
+import parquet_ledger
+from expense_store import ExpenseStore
+from write_queue import ExpenseWriter
+
+DEFAULT_HOUSEHOLD = "default"
+HOUSEHOLD_DIR = os.environ.get("EXPENSE_HOUSEHOLD_DIR", "households")
+MAX_OPEN_SHARDS = int(os.environ.get("EXPENSE_MAX_OPEN_SHARDS", 32))
+AGGREGATE_WORKERS = 8
+
+# Also a directory name, so kept to a safe, case-insensitive alphabet
+HOUSEHOLD_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+def normalize_household(household):
+    household = (household or DEFAULT_HOUSEHOLD).strip().lower()
+    if not HOUSEHOLD_RE.match(household):
+        raise ValueError(f"Invalid household: {household!r}")
+    return household
+
+
+def shard_paths(household, root=HOUSEHOLD_DIR):
+    # household -> (db_path, ledger_root)
+    household = normalize_household(household)
+    if household == DEFAULT_HOUSEHOLD:
+        return expense_store.DB_FILE, parquet_ledger.LEDGER_DIR
+    base = os.path.join(root, household)
+    return os.path.join(base, "expenses.db"), os.path.join(base, "ledger")
+
+
+def ledger_for(db_path, root=HOUSEHOLD_DIR):
+    # Ledger root of the shard whose database is db_path, or None when
+    # db_path is not a shard's database
+    db_path = os.path.abspath(db_path)
+    if db_path == os.path.abspath(expense_store.DB_FILE):
+        return parquet_ledger.LEDGER_DIR
+    base, name = os.path.split(db_path)
+    if name == "expenses.db" and os.path.dirname(base) == os.path.abspath(root):
+        return os.path.join(base, "ledger")
+    return None
+
+
+def list_households(root=HOUSEHOLD_DIR):
+    households = []
+    if os.path.exists(expense_store.DB_FILE):
+        households.append(DEFAULT_HOUSEHOLD)
+    if os.path.isdir(root):
+        for name in sorted(os.listdir(root)):
+            if HOUSEHOLD_RE.match(name) and os.path.exists(os.path.join(root, name, "expenses.db")):
+                households.append(name)
+    return households
+
+
+# ---------- OPEN SHARDS ----------
+class Shard:
+    def __init__(self, household, db_path, ledger_root):
+        self.household = household
+        self.store = ExpenseStore(db_path, ledger_root=ledger_root)
+        self.writer = ExpenseWriter(db_path)
+        self.users = 0
+
+    async def start_writer(self):
+        # Writers start on first use, inside the event loop that submits
+        if not self.writer.running:
+            await self.writer.start()
+
+    async def close(self):
+        await self.writer.stop()
+        self.store.close()
+
+
+# LRU of open shards (store with its read cache, connections and writer).
+# Opening a household past MAX_OPEN_SHARDS closes the least recently used one
+# that no request is using; the default household stays open.
+class ShardPool:
+    def __init__(self, root=HOUSEHOLD_DIR, max_open=MAX_OPEN_SHARDS):
+        self.root = root
+        self.max_open = max_open
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+        self._retiring = set()  # keeps closing shards alive until done
+        self.default = self._open(DEFAULT_HOUSEHOLD)
+
+    def _open(self, household):
+        db_path, ledger_root = shard_paths(household, self.root)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        shard = Shard(household, db_path, ledger_root)
+        self._shards[household] = shard
+        return shard
+
+    def open(self, household=None, create=True):
+        # Returns the shard, marked in use until release(). Raises ValueError
+        # for a malformed id and LookupError for an unknown household when
+        # create is False.
+        household = normalize_household(household)
+        with self._lock:
+            shard = self._shards.get(household)
+            if shard is None:
+                db_path, _ = shard_paths(household, self.root)
+                if not create and not os.path.exists(db_path):
+                    raise LookupError(f"Unknown household: {household}")
+                shard = self._open(household)
+            else:
+                self._shards.move_to_end(household)
+            # In use before evicting, so the new shard is never the one
+            # closed when every other shard is busy; the pool then stays
+            # over max_open until some are released
+            shard.users += 1
+            self._evict()
+        return shard
+
+    def release(self, shard):
+        with self._lock:
+            shard.users -= 1
+
+    @contextmanager
+    def acquire(self, household=None, create=True):
+        shard = self.open(household, create)
+        try:
+            yield shard
+        finally:
+            self.release(shard)
+
+    def _evict(self):
+        excess = len(self._shards) - self.max_open
+        for household, shard in list(self._shards.items()):
+            if excess <= 0:
+                break
+            if shard is self.default or shard.users:
+                continue
+            del self._shards[household]
+            self._retire(shard)
+            excess -= 1
+
+    def _retire(self, shard):
+        # Let the writer flush on its own event loop, then close connections
+        if shard.writer.running:
+            future = asyncio.run_coroutine_threadsafe(shard.close(), shard.writer.loop)
+            self._retiring.add(future)
+            future.add_done_callback(self._retiring.discard)
+        else:
+            shard.store.close()
+
+    def open_households(self):
+        with self._lock:
+            return list(self._shards)
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(shard.writer.queue_depth for shard in self._shards.values())
+
+    async def close(self):
+        # Flush and close every shard; the default one stays registered so
+        # the pool can be started again
+        with self._lock:
+            shards = [s for s in self._shards.values() if s is not self.default]
+            self._shards = OrderedDict([(DEFAULT_HOUSEHOLD, self.default)])
+        for shard in shards:
+            await shard.close()
+        for future in list(self._retiring):
+            await asyncio.wrap_future(future)
+        await self.default.writer.stop()
+
+
+# ---------- CROSS-HOUSEHOLD ----------
+def _household_totals(household, root):
+    # Read-only: a private connection straight to expense_totals, so the
+    # scan neither opens shards in the pool nor evicts any
+    db_path, _ = shard_paths(household, root)
+    conn = expense_store.open_connection(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT dimension, key, amount, count FROM expense_totals "
+            "WHERE dimension IN ('all', 'month') AND count != 0"
+        ).fetchall()
+    finally:
+        conn.close()
+    total = next(((amount, count) for dimension, _, amount, count in rows if dimension == "all"), (0, 0))
+    return {
+        "household": household,
+        "total": total[0],
+        "count": total[1],
+        "months": {key: amount for dimension, key, amount, _ in rows if dimension == "month"},
+    }
+
+
+def aggregate(root=HOUSEHOLD_DIR, workers=AGGREGATE_WORKERS):
+    # Totals for every household, read from the shards in parallel
+    households = list_households(root)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        per_household = list(pool.map(lambda h: _household_totals(h, root), households))
+
+    months = {}
+    for result in per_household:
+        for month, amount in result["months"].items():
+            months[month] = months.get(month, 0) + amount
+    return {
+        "households": per_household,
+        "total": sum(r["total"] for r in per_household),
+        "count": sum(r["count"] for r in per_household),
+        "months": dict(sorted(months.items())),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Household shards")
+    parser.add_argument("command", choices=["list", "summary"])
+    parser.add_argument("--root", default=HOUSEHOLD_DIR)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for household in list_households(args.root):
+            print(household)
+    else:
+        summary = aggregate(args.root)
+        for h in summary["households"]:
+            print(f"{h['household']:<20} {h['count']:>8} expenses  ₹{h['total']:,.0f}")
+        print(f"{'all':<20} {summary['count']:>8} expenses  ₹{summary['total']:,.0f}")
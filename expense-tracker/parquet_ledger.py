@@ -0,0 +1,327 @@
+# Month-partitioned Parquet copy of the expense ledger, for reads that only
+# need part of the history (a month on the dashboard, a date range export).
+#
+#   ledger/year=2024/month=01/append-1041-1102.parquet
+#   ledger/year=2024/month=01/part-1-1040.parquet
+#
+# SQLite stays the write path. sync() copies rows added since the last sync
+# into one small append file per month; compact() merges a month's files into
+# a single sorted part file, and sync() does so itself for any month that
+# reaches COMPACT_AFTER_FILES. File names carry the id range they hold;
+# .watermark holds the highest id copied, and moves only once every file of
+# a sync batch is on disk, so a crash part way leaves no month behind: the
+# next sync drops the batch's stray files and copies it again. A compaction
+# writes its part file before deleting the inputs; files whose range lies
+# inside a part file's are ignored by reads and removed by sync. Deletes and
+# edits in SQLite are not tracked; run rebuild() after those.
+#
+#   python parquet_ledger.py sync|compact|rebuild
+
+import os
+import re
+import shutil
+import time
+from datetime import date as date_type
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import expense_store
+
+LEDGER_DIR = os.environ.get("EXPENSE_LEDGER_DIR", "ledger")
+SYNC_BATCH_ROWS = 100_000
+COMPACT_AFTER_FILES = 8     # files in one month before sync compacts it
+LOCK_STALE_SECONDS = 600
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("date", pa.string()),
+    ("person", pa.string()),
+    ("amount", pa.float64()),
+    ("category", pa.string()),
+    ("description", pa.string()),
+])
+
+FILE_RE = re.compile(r"^(?:append|part)-(\d+)-(\d+)\.parquet$")
+
+
+# ---------- LAYOUT ----------
+def _partition(date):
+    # "2024-01-15" -> (2024, 1); unparseable dates go to year=0000/month=00
+    try:
+        return int(date[:4]), int(date[5:7])
+    except (TypeError, ValueError):
+        return 0, 0
+
+
+def _month_dir(root, year, month):
+    return os.path.join(root, f"year={year:04d}", f"month={month:02d}")
+
+
+def _months(root):
+    # [(year, month, path)] for every partition on disk
+    months = []
+    if not os.path.isdir(root):
+        return months
+    for year_name in sorted(os.listdir(root)):
+        if not year_name.startswith("year="):
+            continue
+        year_path = os.path.join(root, year_name)
+        for month_name in sorted(os.listdir(year_path)):
+            if month_name.startswith("month="):
+                months.append((int(year_name[5:]), int(month_name[6:]), os.path.join(year_path, month_name)))
+    return months
+
+
+def _month_files(month_path):
+    # (live, merged) data files of a month. A file whose id range lies
+    # inside a part file's was merged into it and is only still on disk if
+    # a compaction stopped before deleting its inputs; reads skip it.
+    ranges = {}
+    for name in os.listdir(month_path):
+        match = FILE_RE.match(name)
+        if match:
+            ranges[os.path.join(month_path, name)] = (int(match.group(1)), int(match.group(2)))
+    parts = [
+        (path, low, high) for path, (low, high) in ranges.items()
+        if os.path.basename(path).startswith("part-")
+    ]
+    live, merged = [], []
+    for path, (low, high) in sorted(ranges.items()):
+        covered = any(p != path and p_low <= low and high <= p_high for p, p_low, p_high in parts)
+        (merged if covered else live).append(path)
+    return live, merged
+
+
+def _data_files(month_path):
+    return _month_files(month_path)[0]
+
+
+def _files_for_range(root, start=None, end=None):
+    # Only the partitions overlapping [start, end] are listed at all
+    low = _partition(start) if start else (0, 0)
+    high = _partition(end) if end else (9999, 12)
+    files = []
+    for year, month, path in _months(root):
+        if low <= (year, month) <= high:
+            files.extend(_data_files(path))
+    return files
+
+
+def _watermark(root):
+    # Highest id copied by a completed sync. Ledgers written before the
+    # .watermark file existed fall back to the highest id in any file name.
+    try:
+        with open(os.path.join(root, ".watermark")) as f:
+            return int(f.read())
+    except FileNotFoundError:
+        pass
+    highest = 0
+    for _, _, path in _months(root):
+        for name in os.listdir(path):
+            match = FILE_RE.match(name)
+            if match:
+                highest = max(highest, int(match.group(2)))
+    return highest
+
+
+def _set_watermark(root, watermark):
+    path = os.path.join(root, ".watermark")
+    with open(path + ".tmp", "w") as f:
+        f.write(str(watermark))
+    os.replace(path + ".tmp", path)
+
+
+def _drop_unfinished(root, watermark):
+    # Files of a sync batch that crashed before moving the watermark (their
+    # rows are all above it and will be copied again), and inputs a crashed
+    # compaction left beside the part file it had already written
+    for _, _, path in _months(root):
+        for f in _month_files(path)[1]:
+            os.remove(f)
+        for name in os.listdir(path):
+            match = FILE_RE.match(name)
+            if name.endswith(".tmp") or (match and int(match.group(1)) > watermark):
+                os.remove(os.path.join(path, name))
+
+
+def _write_atomic(table, path):
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+class _LedgerLock:
+    # Cross-process lock file so two syncs/compactions never interleave
+    def __init__(self, root):
+        self.path = os.path.join(root, ".lock")
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        os.remove(self.path)
+
+
+# ---------- WRITES ----------
+def _rows_to_table(rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in SCHEMA]
+    return pa.table(
+        [pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)],
+        schema=SCHEMA,
+    )
+
+
+def sync(db_path=expense_store.DB_FILE, root=LEDGER_DIR):
+    # Copy rows added to SQLite since the last sync; returns the row count
+    copied = 0
+    touched = set()
+    with _LedgerLock(root):
+        watermark = _watermark(root)
+        _drop_unfinished(root, watermark)
+        conn = expense_store.open_connection(db_path)
+        try:
+            cur = conn.execute(
+                f"SELECT {', '.join(SCHEMA.names)} FROM expenses WHERE id > ? ORDER BY id",
+                (watermark,),
+            )
+            while True:
+                rows = cur.fetchmany(SYNC_BATCH_ROWS)
+                if not rows:
+                    break
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(_partition(row[1]), []).append(row)
+                for (year, month), month_rows in by_month.items():
+                    path = _month_dir(root, year, month)
+                    os.makedirs(path, exist_ok=True)
+                    name = f"append-{month_rows[0][0]}-{month_rows[-1][0]}.parquet"
+                    _write_atomic(_rows_to_table(month_rows), os.path.join(path, name))
+                    touched.add(path)
+                _set_watermark(root, rows[-1][0])
+                copied += len(rows)
+        finally:
+            conn.close()
+        # Reads sync first, so without this every read after a write would
+        # leave one more small file in the month
+        for path in touched:
+            files = _data_files(path)
+            if len(files) >= COMPACT_AFTER_FILES:
+                _compact_month(path, files)
+    return copied
+
+
+def _compact_month(path, files):
+    table = ds.dataset(files, schema=SCHEMA, format="parquet").to_table()
+    table = table.sort_by([("date", "ascending"), ("id", "ascending")])
+    ids = table.column("id")
+    name = f"part-{pc.min(ids).as_py()}-{pc.max(ids).as_py()}.parquet"
+    target = os.path.join(path, name)
+    _write_atomic(table, target)
+    for f in files:
+        if f != target:
+            os.remove(f)
+
+
+def compact(root=LEDGER_DIR, min_files=2):
+    # Merge each month's files into one part file sorted by (date, id).
+    # Returns the number of partitions rewritten.
+    rewritten = 0
+    with _LedgerLock(root):
+        for _, _, path in _months(root):
+            files = _data_files(path)
+            if len(files) < min_files:
+                continue
+            _compact_month(path, files)
+            rewritten += 1
+    return rewritten
+
+
+def rebuild(db_path=expense_store.DB_FILE, root=LEDGER_DIR):
+    # Drop the Parquet copy and export everything again, then compact
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    copied = sync(db_path, root)
+    compact(root, min_files=1)
+    return copied
+
+
+# ---------- READS ----------
+def _filter_expression(start=None, end=None, category=None, person=None, text=None):
+    expr = None
+    for clause in [
+        pc.field("date") >= start if start else None,
+        pc.field("date") <= end if end else None,
+        pc.field("category") == category if category else None,
+        pc.field("person") == person if person else None,
+        pc.match_substring(pc.field("description"), text, ignore_case=True) if text else None,
+    ]:
+        if clause is not None:
+            expr = clause if expr is None else expr & clause
+    return expr
+
+
+def _dataset(start, end, root):
+    return ds.dataset(_files_for_range(root, start, end), schema=SCHEMA, format="parquet")
+
+
+def read_ledger(start=None, end=None, category=None, person=None, text=None,
+                columns=None, root=LEDGER_DIR):
+    # Opens only the month partitions in range; the column projection and
+    # filters are pushed down to Parquet row groups
+    table = _dataset(start, end, root).to_table(
+        columns=columns,
+        filter=_filter_expression(start, end, category, person, text),
+    )
+    if "date" in table.column_names and "id" in table.column_names:
+        table = table.sort_by([("date", "ascending"), ("id", "ascending")])
+    return table
+
+
+def iter_ledger_batches(start=None, end=None, category=None, person=None, text=None,
+                        columns=None, root=LEDGER_DIR):
+    # Same as read_ledger, as a stream of record batches in partition order
+    scanner = _dataset(start, end, root).scanner(
+        columns=columns,
+        filter=_filter_expression(start, end, category, person, text),
+    )
+    yield from scanner.to_batches()
+
+
+def month_range(year, month):
+    first = date_type(year, month, 1)
+    following = date_type(year + month // 12, month % 12 + 1, 1)
+    return first.isoformat(), date_type.fromordinal(following.toordinal() - 1).isoformat()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the Parquet expense ledger")
+    parser.add_argument("command", choices=["sync", "compact", "rebuild"])
+    parser.add_argument("--db", default=expense_store.DB_FILE)
+    parser.add_argument("--root", default=LEDGER_DIR)
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        print(f"Copied {sync(args.db, args.root)} rows")
+    elif args.command == "compact":
+        sync(args.db, args.root)
+        print(f"Compacted {compact(args.root)} partitions")
+    else:
+        print(f"Rebuilt ledger with {rebuild(args.db, args.root)} rows")
@@ -0,0 +1,30 @@
+from datetime import date
+
+import pytest
+
+from expense_parser import lex_expense, parse_expense
+
+TODAY = date(2026, 1, 5)
+
+
+@pytest.mark.parametrize("text, amount, when, quantity, unit", [
+    # A fraction before a unit is a quantity, not a date
+    ("1/2 kg onion 40", 40, TODAY, 0.5, "kg"),
+    ("3/4 ltr milk 30", 30, TODAY, 0.75, "ltr"),
+    # The same shape anywhere else is a date
+    ("12/1 rent 5000", 5000, date(2025, 1, 12), None, None),
+    ("rs 200 on 2/1", 200, date(2026, 1, 2), None, None),
+    # 2026 has no 29 February: the amount comes later in the message
+    ("29 feb rent 100", 100, TODAY, None, None),
+    ("rent 100 on 31/4", 100, TODAY, None, None),
+    # A range is read as its first number when there is no other
+    ("paid 50-60 for milk", 50, TODAY, None, None),
+    ("2 kg rice 120 yesterday", 120, date(2026, 1, 4), 2, "kg"),
+])
+def test_lex_expense(text, amount, when, quantity, unit):
+    assert lex_expense(text, TODAY)[:4] == (amount, when, quantity, unit)
+
+
+def test_parse_expense_lowers_text_once():
+    row = parse_expense("Paid ₹1,250 at DMart 12 Dec", TODAY)
+    assert (row["amount"], row["date"], row["merchant"]) == (1250, "2025-12-12", "dmart")
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import expense_store
+import households
+import parquet_ledger
+from expense_store import ExpenseStore
+
+EXPENSE_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "expense_store.py")
+
+
+def add_legacy(db_path, text, copies):
+    # Rows written before dedup keys existed, so duplicates can be present
+    row = ExpenseStore.parse(text, "Asha")
+    conn = expense_store.get_connection(db_path)
+    conn.executemany(
+        "INSERT INTO expenses (date, person, amount, category, description) VALUES (?, ?, ?, ?, ?)",
+        [(row["date"], row["person"], row["amount"], row["category"], row["description"])] * copies,
+    )
+    conn.commit()
+
+
+def ledger_descriptions(root):
+    return sorted(parquet_ledger.read_ledger(root=root).column("description").to_pylist())
+
+
+def test_dedupe_rebuilds_only_the_households_own_ledger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    default_db, default_ledger = households.shard_paths("default")
+    other_db, other_ledger = households.shard_paths("x")
+    os.makedirs(os.path.dirname(other_db))
+
+    add_legacy(default_db, "250 groceries", 1)
+    add_legacy(other_db, "80 chai", 2)
+    parquet_ledger.sync(default_db, default_ledger)
+    parquet_ledger.sync(other_db, other_ledger)
+    expense_store.close_connections(default_db)
+    expense_store.close_connections(other_db)
+
+    subprocess.run([sys.executable, EXPENSE_STORE, "dedupe", "--db", other_db], check=True,
+                   capture_output=True)
+
+    assert ledger_descriptions(default_ledger) == ["250 groceries"]
+    assert ledger_descriptions(other_ledger) == ["80 chai"]
+
+
+def test_ledger_for():
+    assert households.ledger_for(expense_store.DB_FILE) == parquet_ledger.LEDGER_DIR
+    assert households.ledger_for(os.path.join("households", "x", "expenses.db")) == \
+        os.path.abspath(os.path.join("households", "x", "ledger"))
+    assert households.ledger_for("scratch.db") is None
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import households
+from expense_store import ExpenseStore
+
+MAX_OPEN = 3
+CONCURRENT = 8
+
+
+def writer_threads():
+    return sum(t.name.startswith("expense-writer") for t in threading.enumerate())
+
+
+def test_open_past_max_open_keeps_writers_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = households.ShardPool(root=str(tmp_path / "households"), max_open=MAX_OPEN)
+    counts = []
+
+    async def add(household, all_open):
+        with pool.acquire(household) as shard:
+            await shard.start_writer()
+            await shard.writer.submit(ExpenseStore.parse("250 groceries", "Asha"))
+            # Hold the shard until every household is open, so none of the
+            # others can be evicted to make room
+            await all_open.wait()
+
+    async def main():
+        for round in range(3):
+            all_open = asyncio.Event()
+            tasks = [asyncio.create_task(add(f"home-{round}-{i}", all_open)) for i in range(CONCURRENT)]
+            while sum(h.startswith(f"home-{round}") for h in pool.open_households()) < CONCURRENT:
+                await asyncio.sleep(0.01)
+            all_open.set()
+            await asyncio.gather(*tasks)
+            for future in list(pool._retiring):
+                await asyncio.wrap_future(future)
+            counts.append(writer_threads())
+        await pool.close()
+
+    asyncio.run(main())
+    # Every writer thread belongs to a shard in the pool: the households of
+    # the last round, the default one, and nothing orphaned
+    assert max(counts) <= CONCURRENT + 1
+    assert writer_threads() == 0
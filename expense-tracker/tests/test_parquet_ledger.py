@@ -0,0 +1,30 @@
+import os
+import shutil
+
+import expense_store
+import parquet_ledger
+from expense_store import ExpenseStore
+
+
+def test_inputs_left_by_a_crashed_compaction_are_not_read_twice(tmp_path):
+    db = str(tmp_path / "expenses.db")
+    ledger = str(tmp_path / "ledger")
+    for i in range(3):
+        row = ExpenseStore.parse(f"{100 + i} groceries", "Asha")
+        expense_store.add_expenses([{**row, "date": "2024-01-12"}], db)
+        parquet_ledger.sync(db, ledger)
+
+    month = parquet_ledger._month_dir(ledger, 2024, 1)
+    appends = parquet_ledger._data_files(month)
+    assert len(appends) == 3
+    saved = str(tmp_path / "saved.parquet")
+    shutil.copy(appends[0], saved)
+    parquet_ledger.compact(ledger)
+    # As if the compaction stopped after writing the part file
+    shutil.copy(saved, appends[0])
+
+    assert parquet_ledger.read_ledger(root=ledger).num_rows == 3
+    parquet_ledger.sync(db, ledger)
+    assert not os.path.exists(appends[0])
+    parquet_ledger.compact(ledger, min_files=1)
+    assert parquet_ledger.read_ledger(root=ledger).num_rows == 3
@@ -0,0 +1,17 @@
+import expense_store
+from whatsapp_import import import_chat
+
+CHAT = """12/01/2024, 9:15 pm - Rahul: chai 20
+12/01/2024, 9:16 pm - Rahul: chai 20
+12/01/2024, 9:20 pm - Priya: milk 60
+"""
+
+
+def test_repeat_messages_are_kept_and_reimport_adds_nothing(tmp_path):
+    chat = tmp_path / "chat.txt"
+    chat.write_text(CHAT, encoding="utf-8")
+    db = str(tmp_path / "expenses.db")
+
+    assert import_chat(str(chat), workers=1, db_path=db) == 3
+    assert import_chat(str(chat), workers=1, db_path=db) == 0
+    assert expense_store.count_expenses(db) == 3
@@ -0,0 +1,199 @@
+# Bulk import of a WhatsApp "Export chat" .txt file.
+#
+#   python whatsapp_import.py chat.txt --person "Rahul=You" --person "Priya=Wife"
+#   python whatsapp_import.py chat.txt --resume
+#
+# The file is read as a stream of messages, parsed in a process pool one
+# chunk at a time and written in bulk. Only a few chunks are in flight at
+# once, so memory stays flat however large the export is. Each chunk's rows
+# are committed together with the byte offset reached, so --resume carries
+# on exactly where the last committed chunk ended.
+
+import argparse
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import expense_store
+from expense_store import ExpenseStore
+
+CHUNK_SIZE = 2000
+
+# Android: "12/01/2024, 9:15 pm - Rahul: text"
+# iOS:     "[12/01/24, 9:15:32 PM] Rahul: text"
+STAMP = (
+    r"^\u200e?\[?(?P<stamp>(?P<date>\d{1,2}/\d{1,2}/\d{2,4}),?\s+"
+    r"\d{1,2}[:.]\d{2}(?:[:.]\d{2})?(?:[\s\u202f]*[apAP]\.?\s?[mM]\.?)?)\]?"
+)
+HEADER_RE = re.compile(STAMP + r"\s*(?:-\s*)?(?P<sender>[^:]{1,100}?):\s(?P<text>.*)$")
+# A timestamp without "Name:" is a system line ("Priya added Rahul",
+# "Messages and calls are end-to-end encrypted")
+SYSTEM_RE = re.compile(STAMP + r"(?:\s|$)")
+
+
+def read_messages(path, start_offset=0):
+    # Yields (date, stamp, sender, text, next_offset); stamp is the whole
+    # timestamp as written. next_offset is where the following message
+    # starts, i.e. a safe place to resume after this one.
+    # Lines without a header are continuations of the previous message;
+    # system lines end it and are dropped, with anything following them up
+    # to the next message.
+    current = None
+    offset = start_offset
+
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        for raw in f:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            match = HEADER_RE.match(line)
+            if match:
+                if current is not None:
+                    yield (*current, offset)
+                current = (match["date"], match["stamp"], match["sender"].strip(), match["text"])
+            elif SYSTEM_RE.match(line):
+                if current is not None:
+                    yield (*current, offset)
+                current = None
+            elif current is not None:
+                current = (*current[:3], current[3] + "\n" + line)
+            offset += len(raw)
+
+    if current is not None:
+        yield (*current, offset)
+
+
+def chunked(messages, size):
+    chunk = []
+    for message in messages:
+        chunk.append(message)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def to_date(value, dayfirst=True):
+    first, second, year = value.split("/")
+    day, month = (first, second) if dayfirst else (second, first)
+    if len(year) == 2:
+        year = "20" + year
+    return date(int(year), int(month), int(day))
+
+
+def message_id(stamp, sender, text):
+    # Exports carry no message ids, so one is made from what identifies a
+    # message: importing the same export again matches every message, but
+    # "chai 20" sent twice a minute apart is two expenses
+    digest = hashlib.sha1(f"{stamp}\x1f{sender}\x1f{text}".encode("utf-8")).hexdigest()
+    return f"wa:{digest}"
+
+
+def parse_chunk(chunk, person_map, dayfirst):
+    # Runs in a worker process. Messages without an amount are chat, not
+    # expenses, and are dropped.
+    # The message timestamp is "today" for the parser, so "kal" or "12 Jan"
+    # in a message resolve against when it was sent.
+    rows = []
+    for sent, stamp, sender, text, _ in chunk:
+        try:
+            today = to_date(sent, dayfirst)
+        except ValueError:
+            today = None
+        row = ExpenseStore.parse(text, person_map.get(sender, sender), today)
+        if row["amount"]:
+            row["message_id"] = message_id(stamp, sender, text)
+            rows.append(row)
+    return rows, chunk[-1][-1]
+
+
+def import_chat(path, person_map=None, start_offset=0, workers=None,
+                chunk_size=CHUNK_SIZE, dayfirst=True, db_path=expense_store.DB_FILE):
+    source = os.path.abspath(path)
+    person_map = person_map or {}
+    workers = workers or os.cpu_count() or 1
+    total_rows = 0
+    total_bytes = os.path.getsize(path)
+    started = time.perf_counter()
+
+    chunks = chunked(read_messages(path, start_offset), chunk_size)
+    in_flight = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep the pool busy but bounded; results are written in file
+            # order so the saved offset only ever moves forward.
+            while len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                in_flight.append(pool.submit(parse_chunk, chunk, person_map, dayfirst))
+            if not in_flight:
+                break
+
+            rows, next_offset = in_flight.popleft().result()
+            # Messages imported before are skipped, so count what was written
+            total_rows += expense_store.add_expenses(rows, db_path, progress=(source, next_offset))
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"\r{next_offset / max(total_bytes, 1):6.1%}  {total_rows} expenses  "
+                f"{(next_offset - start_offset) / 1e6 / max(elapsed, 1e-9):.1f} MB/s",
+                end="", flush=True,
+            )
+
+    print()
+    return total_rows
+
+
+def parse_person_map(pairs):
+    mapping = {}
+    for pair in pairs:
+        sender, _, person = pair.partition("=")
+        mapping[sender.strip()] = person.strip()
+    return mapping
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a WhatsApp chat export")
+    parser.add_argument("path")
+    parser.add_argument("--person", action="append", default=[], metavar="SENDER=PERSON",
+                        help="map a chat sender name to a Person value")
+    parser.add_argument("--resume", action="store_true", help="continue from the last saved offset")
+    parser.add_argument("--offset", type=int, help="start at this byte offset")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--month-first", action="store_true", help="dates are MM/DD/YY")
+    parser.add_argument("--db", help=f"database file (default {expense_store.DB_FILE})")
+    parser.add_argument("--household", help="import into this household's shard instead of --db")
+    args = parser.parse_args()
+
+    if args.household:
+        import households
+
+        args.db = households.shard_paths(args.household)[0]
+        os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    elif not args.db:
+        args.db = expense_store.DB_FILE
+
+    if args.offset is not None:
+        offset = args.offset
+    elif args.resume:
+        offset = expense_store.get_import_offset(os.path.abspath(args.path), args.db)
+    else:
+        offset = 0
+
+    count = import_chat(
+        args.path,
+        person_map=parse_person_map(args.person),
+        start_offset=offset,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        dayfirst=not args.month_first,
+        db_path=args.db,
+    )
+    print(f"Imported {count} expenses")
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import expense_store
+import metrics
+
+MAX_BATCH_ROWS = 500
+MAX_BATCH_DELAY = 0.005  # seconds to wait for more rows before flushing
+
+
+# Group-commit writer for the API. Requests put their rows on an asyncio
+# queue and wait; a single task drains the queue, writes everything pending
+# in one transaction and then wakes the waiting requests. Only one thread
+# ever writes, so rows can't interleave, and a burst of requests pays for
+# one commit (and one fsync, with EXPENSE_DB_SYNC=FULL) instead of many.
+class ExpenseWriter:
+    def __init__(self, db_path=expense_store.DB_FILE,
+                 max_batch_rows=MAX_BATCH_ROWS, max_batch_delay=MAX_BATCH_DELAY):
+        self.db_path = db_path
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_delay = max_batch_delay
+        self.batches_written = 0
+        self.rows_written = 0
+        self.loop = None
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expense-writer")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Flush whatever is queued, then shut the writer down
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def submit(self, row):
+        return await self.submit_many([row])
+
+    async def submit_many(self, rows):
+        # All rows of one call land in the same transaction
+        if self._task is None:
+            raise RuntimeError("ExpenseWriter is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(rows), future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            job = await self._queue.get()
+            if job is None:
+                break
+            jobs = [job]
+            pending_rows = len(job[0])
+
+            # Keep collecting until the batch is full or the delay runs out
+            deadline = time.monotonic() + self.max_batch_delay
+            while pending_rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        job = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        job = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+                pending_rows += len(job[0])
+
+            rows = [row for job_rows, _, _ in jobs for row in job_rows]
+            started = time.perf_counter()
+            for _, _, queued_at in jobs:
+                metrics.QUEUE_WAIT_SECONDS.observe(started - queued_at)
+            try:
+                inserted = await loop.run_in_executor(
+                    self._executor, expense_store.add_expenses, rows, self.db_path
+                )
+            except Exception as e:
+                metrics.PERSIST_ERRORS.inc()
+                for _, future, _ in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            metrics.PERSIST_SECONDS.observe(time.perf_counter() - started)
+            metrics.PERSIST_BATCH_ROWS.observe(len(rows))
+            metrics.ROWS_WRITTEN.inc(inserted)
+            metrics.DUPLICATE_ROWS.inc(len(rows) - inserted)
+            self.batches_written += 1
+            self.rows_written += inserted
+            for job_rows, future, _ in jobs:
+                if not future.done():
+                    future.set_result(len(job_rows))
@@ -0,0 +1,132 @@
+# HTTP service for the detector, the same analysis as the Streamlit app.
+#
+#   uvicorn api:app --port 8001
+#
+#   POST /analyze {"url": "https://www.amazon.in/dp/B0SAMPLE01"}
+#   POST /analyze {"asin": "B0SAMPLE01", "pages": 5, "whatsapp": true}
+#   POST /analyze {"reviews": ["Nice product", "Stopped working after a week..."]}
+#
+# Page fetches (blocking requests calls) and the review store's SQLite work
+# run on a thread pool, and the scoring of reviews on a process pool, so the
+# event loop only waits. Requests for a product that is already
+# being fetched and analysed (same ASIN and pages) wait for that run instead
+# of starting their own, and get "coalesced": true.
+#
+# Products are analysed through review_store.ReviewStore (REVIEW_STORE_FILE),
+# so a product asked about again only has its new reviews scored; the
+# result covers every review stored for it and "new" says how many were
+# added. Raw review lists are not stored.
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+import requests
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from formatter import format_whatsapp
+from response_cache import ResponseCache
+from review_analyzer import analyze_reviews
+from review_scraper import MAX_PAGES, MAX_WORKERS, RateLimiter, extract_asin, fetch_reviews, make_session
+from review_store import ReviewStore
+
+FETCH_WORKERS = int(os.environ.get("REVIEW_FETCH_WORKERS", 8))              # products fetched at once
+ANALYSIS_WORKERS = int(os.environ.get("REVIEW_ANALYSIS_WORKERS", 0)) or None  # default: CPUs
+
+# Shared by every request: keep-alive connections, one request budget per
+# host, and the on-disk page cache
+session = make_session(FETCH_WORKERS * MAX_WORKERS)
+limiter = RateLimiter()
+cache = ResponseCache()
+store = ReviewStore()
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+analysis_pool = None
+
+# (asin, pages) -> task fetching and analysing that product
+_in_flight = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global analysis_pool
+    # Started before any fetch thread, so worker processes fork cleanly
+    analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    yield
+    fetch_pool.shutdown(wait=False, cancel_futures=True)
+    analysis_pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class AnalyzeRequest(BaseModel):
+    # Exactly one of url, asin or reviews
+    url: str | None = None
+    asin: str | None = Field(None, pattern="^[A-Z0-9]{10}$")
+    reviews: list[str] | None = Field(None, min_length=1)
+    pages: int = Field(MAX_PAGES, ge=1, le=50)
+    # Add the WhatsApp-ready text to the response
+    whatsapp: bool = False
+
+
+async def _fetch_and_analyze(asin, pages):
+    loop = asyncio.get_running_loop()
+    fetch = partial(fetch_reviews, asin, max_pages=pages, session=session, limiter=limiter, cache=cache)
+    try:
+        reviews = await loop.run_in_executor(fetch_pool, fetch)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch reviews: {e}")
+    if not reviews:
+        raise HTTPException(status_code=404, detail=f"No reviews found for {asin}")
+    # The store scores the reviews it hasn't seen on the process pool; only
+    # its SQLite reads and writes run on the fetch thread
+    return await loop.run_in_executor(fetch_pool, store.analyze, asin, reviews, analysis_pool)
+
+
+def _finished(key, task):
+    _in_flight.pop(key, None)
+    if not task.cancelled():
+        task.exception()    # retrieved even if every waiter has gone
+
+
+async def analyze_product(asin, pages):
+    # (result, whether it came from a run another request started)
+    key = (asin, pages)
+    task = _in_flight.get(key)
+    coalesced = task is not None
+    if task is None:
+        task = asyncio.create_task(_fetch_and_analyze(asin, pages))
+        _in_flight[key] = task
+        task.add_done_callback(partial(_finished, key))
+    # A client that disconnects cancels only its own wait, not the run the
+    # other requests are waiting on
+    return await asyncio.shield(task), coalesced
+
+
+@app.post("/analyze")
+async def analyze(request: AnalyzeRequest):
+    if sum(x is not None for x in (request.url, request.asin, request.reviews)) != 1:
+        raise HTTPException(status_code=400, detail="Give exactly one of url, asin or reviews")
+
+    if request.reviews is not None:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(analysis_pool, analyze_reviews, request.reviews)
+        response = {"asin": None, "coalesced": False, **result}
+    else:
+        asin = request.asin or extract_asin(request.url)
+        if not asin:
+            raise HTTPException(status_code=400, detail="Invalid Amazon URL")
+        result, coalesced = await analyze_product(asin, request.pages)
+        response = {"asin": asin, "coalesced": coalesced, **result}
+
+    if request.whatsapp:
+        response["whatsapp"] = format_whatsapp(result)
+    return response
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "in_flight": len(_in_flight)}
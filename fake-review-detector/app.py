@@ -1,14 +1,31 @@
+import requests
 import streamlit as st
-from review_scraper import extract_asin, fetch_reviews
-from review_analyzer import analyze_reviews
+from review_scraper import MAX_PAGES, extract_asin, fetch_reviews
 from formatter import format_whatsapp
+from response_cache import ResponseCache
+from review_store import ReviewStore
 
 st.set_page_config(page_title="Fake Review Detector")
 
+
+# Shared across reruns and sessions; pages seen recently are not refetched
+@st.cache_resource
+def get_cache():
+    return ResponseCache()
+
+
+# Reviews already scored for a product are not scored again
+@st.cache_resource
+def get_store():
+    return ReviewStore()
+
+
 st.title("🕵️‍♂️ Fake / Biased Review Detector")
 st.write("Paste an Amazon product link to analyze review authenticity")
 
 url = st.text_input("Amazon Product URL")
+pages = st.slider("Review pages to read", 1, 50, MAX_PAGES)
+offline = st.checkbox("Offline (only use cached pages)")
 
 if st.button("Analyze Reviews"):
     asin = extract_asin(url)
@@ -17,12 +34,18 @@ if st.button("Analyze Reviews"):
         st.error("Invalid Amazon URL")
     else:
         with st.spinner("Fetching reviews..."):
-            reviews = fetch_reviews(asin)
+            cache = get_cache().offline_view() if offline else get_cache()
+            try:
+                reviews = fetch_reviews(asin, max_pages=pages, cache=cache)
+            except requests.RequestException:
+                reviews = []    # blocked or unreachable even after retries
 
         if not reviews:
             st.warning("Could not fetch reviews. Try again later.")
         else:
-            result = analyze_reviews(reviews)
+            with st.spinner("Analyzing reviews..."):
+                result = get_store().analyze(asin, reviews)
+            st.caption(f"{result['new']} new of {result['total']} stored reviews for {asin}")
 
             st.subheader("📱 WhatsApp Ready Output")
             st.code(format_whatsapp(result), language="text")
@@ -0,0 +1,179 @@
+# Audit many products from the command line, one JSON line per product.
+#
+#   python audit.py products.txt -o audit.jsonl --workers 8
+#
+# products.txt holds Amazon product URLs or bare ASINs, one per line (blank
+# lines and "#" comments are skipped). The output doubles as the
+# checkpoint: products already in it are skipped, so a run that was
+# interrupted carries on where it stopped when started again with the same
+# output file. Failures, including products where no reviews came back (a
+# 404 or a block page), are written with "status": "error" and the reason
+# in "error", and retried next run; when an ASIN appears more than once,
+# its last line is the current one.
+# --store keeps every review in review_store.ReviewStore, so products seen
+# before only have their new reviews scored. --phrases adds every product's
+# review phrases to a phrase_sketch.SpaceSaving saved at that path, for the
+# most common phrases across the whole catalogue.
+
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from phrase_sketch import SpaceSaving, count_phrases
+from response_cache import ResponseCache
+from review_analyzer import analyze_reviews
+from review_scraper import (MAX_PAGES, MAX_WORKERS, REQUESTS_PER_SECOND, RateLimiter, extract_asin,
+                            fetch_reviews, make_session)
+from review_store import STORE_FILE, ReviewStore
+
+PRODUCT_WORKERS = 8     # products fetched at the same time
+SAVE_EVERY = 100        # products between saves of the phrase sketch
+ASIN_RE = re.compile(r"^[A-Z0-9]{10}$")
+
+
+def read_products(path):
+    # (input line, ASIN or None) for every product line
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            yield line, line if ASIN_RE.match(line) else extract_asin(line)
+
+
+def load_checkpoint(path):
+    # ASINs already audited successfully. A line cut short by a crash is
+    # dropped so that new lines start on a clean one; any other line that
+    # does not decode is skipped, and its product audited again.
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            try:
+                record = json.loads(line)
+                asin = record["asin"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if "error" in record:
+                done.discard(asin)
+            else:
+                done.add(asin)
+        f.truncate(good)
+    return done
+
+
+def audit_product(asin, max_pages, session, limiter, cache, analysis_pool, store, want_phrases=False):
+    # (result record, phrase counts or None)
+    reviews = fetch_reviews(asin, max_pages=max_pages, session=session, limiter=limiter, cache=cache)
+    if not reviews:
+        raise LookupError("no reviews found")
+    counted = analysis_pool.submit(count_phrases, reviews) if want_phrases else None
+    # Tallies run in another process so fetch threads are not held up
+    if store is not None:
+        result = store.analyze(asin, reviews, analysis_pool)
+    else:
+        result = analysis_pool.submit(analyze_reviews, reviews).result()
+    return {"asin": asin, "status": "ok", **result}, counted.result() if counted else None
+
+
+def run(input_path, output_path, workers=PRODUCT_WORKERS, max_pages=MAX_PAGES,
+        per_second=REQUESTS_PER_SECOND, cache=None, analysis_workers=None, store=None, phrases_path=None,
+        log=sys.stderr):
+    done = load_checkpoint(output_path)
+    # Products are only added to the sketch once (skipped ones are already
+    # in it), except those finished after its last save before a crash
+    sketch = SpaceSaving.load(phrases_path) if phrases_path else None
+    counts = {"audited": 0, "skipped": 0, "failed": 0, "invalid": 0}
+    session = make_session(workers * MAX_WORKERS)
+    limiter = RateLimiter(per_second)   # one budget per host for the whole run
+    started = time.monotonic()
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=analysis_workers) as analysis_pool:
+
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        def finish(future):
+            asin = in_flight.pop(future)
+            try:
+                record, phrase_counts = future.result()
+                write(record)
+                counts["audited"] += 1
+            except Exception as e:
+                write({"asin": asin, "status": "error", "error": f"{type(e).__name__}: {e}"})
+                counts["failed"] += 1
+            else:
+                if sketch is not None:
+                    sketch.update(phrase_counts)
+                    if counts["audited"] % SAVE_EVERY == 0:
+                        sketch.save(phrases_path)
+            finished = counts["audited"] + counts["failed"]
+            if log and finished % 100 == 0:
+                rate = finished / (time.monotonic() - started)
+                print(f"{finished} products, {rate:.1f}/s", file=log)
+
+        # At most `workers` products in flight; the input is read as it goes
+        in_flight = {}
+        try:
+            for line, asin in read_products(input_path):
+                if asin is None:
+                    counts["invalid"] += 1
+                    if log:
+                        print(f"No ASIN in: {line}", file=log)
+                    continue
+                if asin in done:
+                    counts["skipped"] += 1
+                    continue
+                done.add(asin)
+                while len(in_flight) >= workers:
+                    for future in wait(in_flight, return_when=FIRST_COMPLETED).done:
+                        finish(future)
+                future = fetch_pool.submit(audit_product, asin, max_pages, session, limiter, cache,
+                                           analysis_pool, store, sketch is not None)
+                in_flight[future] = asin
+            for future in list(in_flight):
+                future.exception()
+                finish(future)
+        except KeyboardInterrupt:
+            # Finished products are already written; the rest run next time
+            for future in in_flight:
+                future.cancel()
+            raise
+        finally:
+            if sketch is not None:
+                sketch.save(phrases_path)
+
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Audit many products to a JSONL file")
+    parser.add_argument("products", help="file of product URLs or ASINs, one per line")
+    parser.add_argument("-o", "--output", default="audit.jsonl")
+    parser.add_argument("--workers", type=int, default=PRODUCT_WORKERS, help="products fetched at once")
+    parser.add_argument("--pages", type=int, default=MAX_PAGES, help="review pages per product")
+    parser.add_argument("--per-second", type=float, default=REQUESTS_PER_SECOND, help="requests per second per host")
+    parser.add_argument("--analysis-workers", type=int, default=None, help="processes for analysis (default: CPUs)")
+    parser.add_argument("--cache", action="store_true", help="reuse and fill the on-disk page cache")
+    parser.add_argument("--store", nargs="?", const=STORE_FILE, help="keep reviews in this review store")
+    parser.add_argument("--phrases", help="add review phrases to this phrase sketch")
+    args = parser.parse_args()
+
+    counts = run(args.products, args.output, args.workers, args.pages, args.per_second,
+                 ResponseCache() if args.cache else None, args.analysis_workers,
+                 ReviewStore(args.store) if args.store else None, args.phrases)
+    print(f"Audited {counts['audited']}, failed {counts['failed']}, "
+          f"already done {counts['skipped']}, invalid {counts['invalid']}")
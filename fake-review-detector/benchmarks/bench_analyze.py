@@ -0,0 +1,40 @@
+# analyze_reviews serially and sharded over a process pool, on synthetic
+# reviews; checks the parallel result is identical to the serial one.
+#
+#   python benchmarks/bench_analyze.py --reviews 400000 --workers 1 2 4 8
+
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bench_sentiment import synthetic_reviews
+from review_analyzer import analyze_reviews
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=400000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    reviews = synthetic_reviews(args.reviews)
+    print(f"{args.reviews} reviews, {os.cpu_count()} CPUs")
+
+    serial = None
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        result = analyze_reviews(reviews, workers=workers)
+        seconds = time.perf_counter() - start
+        if serial is None:
+            serial, serial_seconds = result, seconds
+        same = "same" if result == serial else "DIFFERENT"
+        print(f"  workers={workers:<3} {seconds:7.2f}s  {serial_seconds / seconds:5.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# near_duplicates.clusters at growing corpus sizes, with a planted
+# copy-paste ring of lightly edited reviews that should come back as one
+# cluster. Time should grow roughly linearly with the number of reviews.
+#
+#   python benchmarks/bench_near_duplicates.py --reviews 25000 50000 100000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bench_sentiment import synthetic_reviews
+from near_duplicates import clusters
+
+RING = ("I bought this for my mother and she absolutely loves it, the quality is outstanding "
+        "and delivery was super quick. Highly recommended to everyone!")
+
+
+def plant_ring(reviews, size, seed=1):
+    rng = random.Random(seed)
+    planted = rng.sample(range(len(reviews)), size)
+    for i in planted:
+        reviews[i] = (RING.replace("mother", rng.choice(["mother", "mom"]))
+                      .replace("!", rng.choice(["!", "!!", ".", " :)"])))
+    return set(planted)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, nargs="+", default=[25000, 50000, 100000])
+    parser.add_argument("--ring", type=int, default=50)
+    args = parser.parse_args()
+
+    for count in args.reviews:
+        reviews = synthetic_reviews(count)
+        planted = plant_ring(reviews, args.ring)
+        start = time.perf_counter()
+        found = clusters(reviews)
+        seconds = time.perf_counter() - start
+        best = max(found, key=lambda c: len(planted & set(c)), default=[])
+        print(f"{count:>8} reviews  {seconds:6.2f}s  {count / seconds:8,.0f} reviews/s  "
+              f"{len(found)} clusters  ring recall {len(planted & set(best))}/{len(planted)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Parse time and peak memory of parse_review_records (review nodes only)
+# against the original full-tree parse, on the saved pages in samples/.
+#
+# The saved pages carry little besides the reviews; live pages are several
+# hundred KB of navigation, scripts and widgets. --pad-kb appends that much
+# such markup to every page to see how each parser copes with it.
+#
+#   python benchmarks/bench_parse.py --repeat 20 --pad-kb 300
+
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+
+from review_scraper import parse_review_records
+
+WIDGET = ('<div class="a-section a-spacing-base widget"><ul class="a-unordered-list">'
+          '<li><a href="/gp/product/B0000000{0:02d}" class="a-link-normal">Customers also bought item {0}</a>'
+          '<span class="a-price"><span class="a-offscreen">₹{0}99</span></span></li></ul></div>\n'
+          '<script type="text/javascript">P.when("A").execute(function(A){{A.state("w{0}",'
+          '{{"ids":[1,2,3],"src":"https://m.media-amazon.com/images/I/{0}.js"}});}});</script>\n')
+
+
+def parse_reviews_full(html):
+    # parse_reviews before the strainer: the whole page becomes a tree
+    soup = BeautifulSoup(html, "html.parser")
+    reviews = []
+
+    for block in soup.select(".review-text-content span"):
+        text = block.get_text(strip=True)
+        if len(text) > 20:
+            reviews.append(text)
+
+    last = soup.select_one(".a-pagination .a-last.a-disabled") is not None
+    return reviews, last
+
+
+def padded(html, kb):
+    filler = ""
+    i = 0
+    while len(filler) < kb * 1024:
+        filler += WIDGET.format(i % 100)
+        i += 1
+    return html.replace("</body>", filler + "</body>")
+
+
+def measure(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html)
+    seconds = (time.perf_counter() - start) / (repeat * len(pages))
+
+    peak = 0
+    for html in pages:
+        tracemalloc.start()
+        parse(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--pad-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "samples", "*", "page-*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(padded(f.read(), args.pad_kb))
+    size = sum(map(len, pages)) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KB on average")
+
+    for name, parse in (("full tree", parse_reviews_full), ("review nodes", parse_review_records)):
+        seconds, peak = measure(parse, pages, args.repeat)
+        print(f"  {name:<13} {seconds * 1000:7.2f} ms/page   peak {peak / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Space-Saving phrase sketch against an exact Counter of the same phrases:
+# memory (entries kept), top-k recall and count error, and the same for
+# sketches built on separate shards and merged.
+#
+#   python benchmarks/bench_phrases.py --reviews 200000 --capacity 2000
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bench_sentiment import synthetic_reviews
+from phrase_sketch import SpaceSaving, count_phrases, phrases, sketch_reviews
+
+
+def report(name, sketch, exact, k, seconds):
+    true_top = {phrase for phrase, _ in exact.most_common(k)}
+    top = sketch.top(k)
+    recall = len(true_top & {phrase for phrase, _, _ in top}) / len(true_top)
+    over = max(count - exact[phrase] for phrase, count, _ in top)
+    bound_ok = all(count - exact[phrase] <= error for phrase, count, error in top)
+    print(f"  {name:<18} {seconds:6.2f}s  {len(sketch.counts):>8,} entries  top-{k} recall {recall:.0%}  "
+          f"max overcount {over}  within error {'yes' if bound_ok else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=200000)
+    parser.add_argument("--capacity", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=1000, help="reviews are split into this many products")
+    parser.add_argument("--shards", type=int, default=4, help="sketches merged at the end")
+    parser.add_argument("-k", type=int, default=25)
+    args = parser.parse_args()
+
+    reviews = synthetic_reviews(args.reviews)
+    size = -(-len(reviews) // args.products)
+    products = [reviews[i:i + size] for i in range(0, len(reviews), size)]
+
+    start = time.perf_counter()
+    exact = Counter()
+    for review in reviews:
+        exact.update(phrases(review))
+    print(f"{args.reviews} reviews, {exact.total():,} phrases, {len(exact):,} distinct "
+          f"(exact Counter {time.perf_counter() - start:.2f}s)")
+
+    # One sketch fed product by product, as audit.py does
+    start = time.perf_counter()
+    sketch = SpaceSaving(args.capacity)
+    for product in products:
+        sketch.update(count_phrases(product))
+    report("streamed", sketch, exact, args.k, time.perf_counter() - start)
+
+    # Shards sketched separately (as separate processes or runs would) and merged
+    start = time.perf_counter()
+    per_shard = -(-len(products) // args.shards)
+    merged = SpaceSaving(args.capacity)
+    for i in range(0, len(products), per_shard):
+        merged.merge(sketch_reviews([r for p in products[i:i + per_shard] for r in p], args.capacity))
+    report(f"{args.shards} shards merged", merged, exact, args.k, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Batched sentiment.polarities against one TextBlob(review).sentiment per
+# review, on synthetic reviews: speed, largest polarity difference and
+# verdict agreement in analyze_reviews.
+#
+#   python benchmarks/bench_sentiment.py --reviews 100000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+from textblob import TextBlob
+
+import sentiment
+from review_analyzer import GENERIC_PHRASES
+
+OPENERS = ["", "Honestly", "Overall", "After 2 weeks,", "Bought this for my dad.", "Update:", "Pros:"]
+SUBJECTS = ["the product", "it", "the battery", "sound quality", "the build", "delivery", "this phone",
+            "the packaging", "customer service", "the fit", "the screen"]
+VERBS = ["is", "was", "seems", "feels", "looks", "has been", "isn't", "wasn't", "doesn't seem"]
+MODIFIERS = ["", "", "very", "really", "not", "not very", "extremely", "quite", "pretty", "never", "too"]
+ADJECTIVES = ["good", "great", "bad", "awesome", "terrible", "okay", "decent", "poor", "amazing",
+              "cheap", "worst", "excellent", "useless", "fine", "happy", "disappointing", "sturdy"]
+ENDINGS = ["", ".", "!", "!!", "!!!", "...", " :)", " :(", " (!)", " 5/5", " value for money.",
+           " nice product", " Would not recommend.", " Totally worth it!"]
+
+
+def synthetic_reviews(count, seed=7):
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(1, 4)):
+            sentence = " ".join(w for w in (
+                rng.choice(OPENERS), rng.choice(SUBJECTS), rng.choice(VERBS),
+                rng.choice(MODIFIERS), rng.choice(ADJECTIVES),
+            ) if w) + rng.choice(ENDINGS)
+            sentences.append(sentence[0].upper() + sentence[1:])
+        reviews.append(" ".join(sentences))
+    return reviews
+
+
+def verdicts(reviews, polarities):
+    # Same rules as analyze_reviews
+    out = []
+    for review, polarity in zip(reviews, polarities):
+        lower = review.lower()
+        if len(review.split()) < 6 and polarity > 0.5:
+            out.append("fake")
+        elif any(p in lower for p in GENERIC_PHRASES) or abs(polarity) > 0.8:
+            out.append("suspicious")
+        else:
+            out.append("genuine")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=100000)
+    args = parser.parse_args()
+
+    reviews = synthetic_reviews(args.reviews)
+    sentiment.vocabulary()  # lexicon load, paid once per process
+
+    start = time.perf_counter()
+    baseline = np.array([TextBlob(r).sentiment.polarity for r in reviews])
+    textblob_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = sentiment.polarities(reviews)
+    batched_seconds = time.perf_counter() - start
+
+    difference = np.abs(baseline - batched)
+    agree = sum(a == b for a, b in zip(verdicts(reviews, baseline), verdicts(reviews, batched)))
+
+    print(f"{args.reviews} reviews")
+    print(f"  TextBlob per review  {textblob_seconds:8.2f}s  {args.reviews / textblob_seconds:10,.0f} reviews/s")
+    print(f"  batched              {batched_seconds:8.2f}s  {args.reviews / batched_seconds:10,.0f} reviews/s"
+          f"  ({textblob_seconds / batched_seconds:.0f}x)")
+    print(f"  max |difference|     {difference.max():.2e}   verdicts agree {agree}/{args.reviews}")
+
+
+if __name__ == "__main__":
+    main()
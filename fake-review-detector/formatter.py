@@ -1,3 +1,14 @@
+def format_duplicates(clusters, limit=3):
+    if not clusters:
+        return "None found"
+    copies = sum(c["size"] for c in clusters)
+    lines = [f"{len(clusters)} groups, {copies} reviews"]
+    for c in clusters[:limit]:
+        sample = c["sample"] if len(c["sample"]) <= 60 else c["sample"][:57] + "..."
+        lines.append(f"• {c['size']}x \"{sample}\"")
+    return "\n".join(lines)
+
+
 def format_whatsapp(result):
     return f"""
 🕵️‍♂️ Fake Review Detection Report
@@ -11,6 +22,9 @@ def format_whatsapp(result):
 ⚠️ Common Repeated Words:
 {", ".join([w[0] for w in result['common_words']])}
 
+👯 Near-Duplicate Reviews:
+{format_duplicates(result.get('duplicate_clusters', []))}
+
 📌 Tip:
 Avoid products with many short generic 5⭐ reviews
 """
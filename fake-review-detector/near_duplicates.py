@@ -0,0 +1,168 @@
+# Near-duplicate reviews (copy-paste rings) with MinHash and LSH.
+#
+# Each review becomes a set of word 3-gram shingles, summarised by a MinHash
+# signature of NUM_PERM minimums. Signatures are cut into BANDS bands; reviews
+# sharing any band land in the same bucket and become candidates, so the work
+# stays linear in the number of reviews instead of comparing every pair.
+# Candidates whose signatures agree on at least SIMILARITY of their slots
+# (an estimate of shingle Jaccard similarity) are joined into clusters.
+#
+# Signatures and band keys depend on one review only, so shard_signatures
+# can run per shard in worker processes; group_signatures then only buckets
+# and joins the concatenated results.
+
+import re
+import zlib
+from itertools import chain
+
+import numpy as np
+
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+BANDS = 16              # 4 rows each: pairs above ~0.5 similarity usually collide
+SIMILARITY = 0.7         # one word changed in a 20-word review is ~0.75
+MIN_WORDS = 4           # shorter reviews are left to the generic-phrase rules
+EXAMPLES = 5            # review indices reported per cluster
+
+WORD_RE = re.compile(r"\w+")
+PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+
+class _Ids(dict):
+    # word -> id in order of first appearance
+    def __missing__(self, word):
+        self[word] = len(self)
+        return self[word]
+
+
+def _shingles(reviews):
+    # Hash of every word 3-gram and the review it belongs to; reviews
+    # shorter than MIN_WORDS get none
+    words = [WORD_RE.findall(review.lower()) for review in reviews]
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    lengths[lengths < MIN_WORDS] = 0
+    words = [w if len(w) >= MIN_WORDS else [] for w in words]
+
+    vocab = _Ids()
+    ids = np.fromiter(map(vocab.__getitem__, chain.from_iterable(words)), dtype=np.int64, count=int(lengths.sum()))
+    word_hash = np.fromiter((zlib.crc32(w.encode()) for w in vocab), dtype=np.uint64, count=len(vocab))
+    hashes = word_hash[ids]
+
+    # A review of n words has n - 2 shingles, starting at its first n - 2 words
+    counts = np.maximum(lengths - (SHINGLE_WORDS - 1), 0)
+    ends = np.cumsum(lengths)
+    owner = np.repeat(np.arange(len(reviews)), counts)
+    starts = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) \
+        + np.repeat(ends - lengths, counts)
+
+    mixed = np.zeros(len(starts), dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        mixed = mixed * np.uint64(1000003) ^ hashes[starts + offset]
+    return mixed % np.uint64(PRIME), owner
+
+
+def signatures(reviews):
+    # (review indices, MinHash signature per review) for reviews long enough
+    values, owner = _shingles(reviews)
+    indices, first = np.unique(owner, return_index=True)
+    signature = np.empty((len(indices), NUM_PERM), dtype=np.uint64)
+    if len(values):
+        for k in range(NUM_PERM):
+            signature[:, k] = np.minimum.reduceat((_A[k] * values + _B[k]) % np.uint64(PRIME), first)
+    return indices, signature
+
+
+def band_keys(signature):
+    # One 64-bit key per review and band; a rare collision only adds a
+    # candidate, which the similarity check then drops
+    rows = NUM_PERM // BANDS
+    keys = np.zeros((len(signature), BANDS), dtype=np.uint64)
+    for band in range(BANDS):
+        for column in signature[:, band * rows:(band + 1) * rows].T:
+            keys[:, band] = keys[:, band] * np.uint64(1000003) ^ column
+    return keys
+
+
+def shard_signatures(reviews, offset=0):
+    # (indices, signature, band keys) for one shard of a larger list whose
+    # first review is number offset. Minimums are below PRIME, so the
+    # signature travels back from a worker as uint32.
+    indices, signature = signatures(reviews)
+    return indices + offset, signature.astype(np.uint32), band_keys(signature)
+
+
+def merge_signatures(parts):
+    # shard_signatures results, in shard order, as one set of arguments to
+    # group_signatures
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def clusters(reviews, similarity=SIMILARITY):
+    # Groups of near-identical reviews, largest first, as lists of indices
+    # into reviews
+    return group_signatures(*signatures(list(reviews)), similarity=similarity)
+
+
+def group_signatures(indices, signature, keys=None, similarity=SIMILARITY):
+    # clusters() from signatures computed earlier (in shards, or stored);
+    # keys are their band_keys when already known
+    if len(indices) < 2:
+        return []
+    if keys is None:
+        keys = band_keys(signature)
+
+    pairs = []
+    for band in range(BANDS):
+        bucket = keys[:, band]
+        # Compare each member with the first member of its bucket
+        order = np.argsort(bucket, kind="stable")
+        sorted_bucket = bucket[order]
+        heads = np.flatnonzero(np.concatenate(([True], sorted_bucket[1:] != sorted_bucket[:-1])))
+        head = order[np.repeat(heads, np.diff(np.append(heads, len(order))))]
+        members = order != head
+        pairs.append(np.stack((order[members], head[members]), axis=1))
+    # Deduplicated as one int64 per pair, much faster than unique rows
+    n = len(indices)
+    pairs = np.concatenate(pairs)
+    pairs = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    pairs = np.stack((pairs // n, pairs % n), axis=1)
+    if not len(pairs):
+        return []
+
+    agree = (signature[pairs[:, 0]] == signature[pairs[:, 1]]).mean(axis=1)
+    parent = list(range(len(indices)))
+    for a, b in pairs[agree >= similarity].tolist():
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for i in range(len(indices)):
+        groups.setdefault(_find(parent, i), []).append(int(indices[i]))
+    found = [group for group in groups.values() if len(group) > 1]
+    return sorted(found, key=lambda group: (-len(group), group[0]))
+
+
+def summarize(groups, reviews, examples=EXAMPLES):
+    # Clusters in the shape analyze_reviews reports: the size, the first
+    # review's text and the indices of the first few, not every member
+    return [
+        {"size": len(group), "sample": reviews[group[0]], "examples": group[:examples]}
+        for group in groups
+    ]
+
+
+def duplicate_clusters(reviews, similarity=SIMILARITY):
+    reviews = list(reviews)
+    return summarize(clusters(reviews, similarity), reviews)
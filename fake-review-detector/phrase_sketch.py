@@ -0,0 +1,174 @@
+# Most frequent review phrases across a whole catalogue in fixed memory.
+#
+# Phrases are 1-3 word n-grams that neither start nor end with a stopword
+# ("value for money", "battery life", but not "for money" or "is good").
+# Counts are kept in a Space-Saving sketch of CAPACITY entries: every phrase
+# in it carries a count that may overestimate the true one by at most its
+# error, and any phrase seen more than total / CAPACITY times is in it.
+# Sketches merge (per product, per process, per run) without losing that
+# guarantee, and save to JSON.
+#
+#   python phrase_sketch.py top phrases.json
+#   python phrase_sketch.py merge a.json b.json -o all.json
+
+import heapq
+import json
+import os
+import re
+from collections import Counter
+
+CAPACITY = 10000
+MAX_WORDS = 3
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not of off on once only or other our ours ourselves out over own same
+she should so some such than that the their theirs them themselves then there these they this
+those through to too under until up very was we were what when where which while who whom why
+will with would you your yours yourself yourselves i'm it's i've don't didn't doesn't isn't
+""".split())
+
+
+def phrases(review, max_words=MAX_WORDS):
+    # Every phrase of up to max_words words in the review, in order
+    words = WORD_RE.findall(review.lower())
+    out = []
+    for i, first in enumerate(words):
+        if first in STOPWORDS:
+            continue
+        for n in range(1, max_words + 1):
+            if i + n > len(words):
+                break
+            if words[i + n - 1] not in STOPWORDS:
+                out.append(" ".join(words[i:i + n]))
+    return out
+
+
+class SpaceSaving:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}    # phrase -> [count, error]
+        self._heap = []     # (count, phrase); stale entries are skipped
+
+    def add(self, phrase, count=1):
+        self.total += count
+        entry = self.counts.get(phrase)
+        if entry is None:
+            if len(self.counts) < self.capacity:
+                entry = self.counts[phrase] = [0, 0]
+            else:
+                # Replace the smallest: the newcomer inherits its count as error
+                floor = self._pop_min()
+                entry = self.counts[phrase] = [floor, floor]
+        entry[0] += count
+        heapq.heappush(self._heap, (entry[0], phrase))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, p) for p, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, phrase = heapq.heappop(self._heap)
+            entry = self.counts.get(phrase)
+            if entry is not None and entry[0] == count:
+                del self.counts[phrase]
+                return count
+
+    def update(self, counts):
+        # Add a Counter (or any phrase -> count mapping)
+        for phrase, count in counts.items():
+            self.add(phrase, count)
+
+    def min_count(self):
+        # What a phrase not in a full sketch may have been seen up to
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counts.values())
+
+    def merge(self, other):
+        # Combined sketch of both streams. A phrase missing from a full
+        # sketch may still have up to its min_count there, so that much is
+        # added to both count and error.
+        floor, other_floor = self.min_count(), other.min_count()
+        merged = {}
+        for phrase in self.counts.keys() | other.counts.keys():
+            count, error = self.counts.get(phrase, (floor, floor))
+            other_count, other_error = other.counts.get(phrase, (other_floor, other_floor))
+            merged[phrase] = [count + other_count, error + other_error]
+        keep = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self.counts = {phrase: entry for phrase, entry in keep}
+        self.total += other.total
+        self._heap = [(c, p) for p, (c, _) in self.counts.items()]
+        heapq.heapify(self._heap)
+        return self
+
+    def top(self, k=20):
+        # [(phrase, count, error)], highest count first
+        ranked = heapq.nlargest(k, self.counts.items(), key=lambda item: (item[1][0], -item[1][1]))
+        return [(phrase, count, error) for phrase, (count, error) in ranked]
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "total": self.total, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        sketch.counts = {phrase: list(entry) for phrase, entry in data["counts"].items()}
+        sketch._heap = [(c, p) for p, (c, _) in sketch.counts.items()]
+        heapq.heapify(sketch._heap)
+        return sketch
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, capacity=CAPACITY):
+        if not os.path.exists(path):
+            return cls(capacity)
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def count_phrases(reviews):
+    # Exact phrase counts of one batch, e.g. a product's reviews
+    counts = Counter()
+    for review in reviews:
+        counts.update(phrases(review))
+    return counts
+
+
+def sketch_reviews(reviews, capacity=CAPACITY):
+    # Counted exactly first, so the sketch only sees each distinct phrase once
+    sketch = SpaceSaving(capacity)
+    sketch.update(count_phrases(reviews))
+    return sketch
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Catalogue phrase sketches")
+    parser.add_argument("command", choices=["top", "merge"])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("-o", "--output", help="merged sketch (merge)")
+    parser.add_argument("-k", type=int, default=25, help="phrases to list (top)")
+    args = parser.parse_args()
+
+    sketch = SpaceSaving.load(args.paths[0])
+    for path in args.paths[1:]:
+        sketch.merge(SpaceSaving.load(path))
+    if args.command == "merge":
+        sketch.save(args.output or args.paths[0])
+        print(f"Merged {len(args.paths)} sketches, {sketch.total:,} phrases")
+    else:
+        print(f"{sketch.total:,} phrases; counts may be high by up to the figure after them")
+        for phrase, count, error in sketch.top(args.k):
+            print(f"  {count:>10,}  {error:<8,} {phrase}")
@@ -0,0 +1,245 @@
+# On-disk cache of fetched review pages, keyed by page URL.
+#
+#   .review_cache/index.db                   key -> body digest, validators, times
+#   .review_cache/objects/ab/abcd....gz      page bodies, named by content hash
+#
+# A page younger than the TTL is served from disk without any request.
+# Older pages are revalidated with If-None-Match / If-Modified-Since when the
+# server sent an ETag or Last-Modified; a 304 renews the entry without
+# downloading the page again. Past MAX_BYTES the least recently used entries
+# are evicted. Offline mode serves whatever is cached, however old, and never
+# touches the network.
+#
+#   python response_cache.py stats|prune|clear
+
+import copy
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.environ.get("REVIEW_CACHE_DIR", ".review_cache")
+TTL = float(os.environ.get("REVIEW_CACHE_TTL", 6 * 3600))             # seconds
+MAX_BYTES = int(os.environ.get("REVIEW_CACHE_MAX_BYTES", 100 * 2**20))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_used ON entries(used_at);
+CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries(digest);
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    def __init__(self, root=CACHE_DIR, ttl=TTL, max_bytes=MAX_BYTES, offline=False):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = self.revalidated = self.misses = 0
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def offline_view(self):
+        # Same cache, replay only; for one caller without changing the
+        # shared instance
+        view = copy.copy(self)
+        view.offline = True
+        return view
+
+    # ----- objects -----
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.gz")
+
+    def _read(self, digest):
+        try:
+            with gzip.open(self._object_path(digest), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, body):
+        # Same content, same file: unchanged pages are stored once
+        digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        return digest, os.path.getsize(path)
+
+    # ----- entries -----
+    def get(self, key):
+        # Cached body for key regardless of age, or None
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+        return self._read(row[0]) if row else None
+
+    def fetch(self, key, request):
+        # Body for key, from disk when fresh, otherwise via request(headers),
+        # which returns a requests.Response or None when the page is gone.
+        # Returns None for a missing page (or, offline, an uncached one).
+        with self._lock:
+            entry = self._conn.execute(
+                "SELECT digest, etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        now = time.time()
+
+        if entry and (self.offline or now - entry[3] < self.ttl):
+            body = self._read(entry[0])
+            if body is not None:
+                self._touch(key, now)
+                self.hits += 1
+                return body
+            entry = None  # object file lost; fetch again
+        if self.offline:
+            self.misses += 1
+            return None
+
+        headers = {}
+        if entry and entry[1]:
+            headers["If-None-Match"] = entry[1]
+        if entry and entry[2]:
+            headers["If-Modified-Since"] = entry[2]
+        response = request(headers)
+
+        if response is not None and response.status_code == 304:
+            body = self._read(entry[0])
+            if body is not None:
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "UPDATE entries SET fetched_at = ?, used_at = ? WHERE key = ?", (now, now, key)
+                    )
+                self.revalidated += 1
+                return body
+            response = request({})  # nothing to fall back on: plain refetch
+        if response is None:
+            self.delete(key)
+            return None
+
+        self.misses += 1
+        body = response.text
+        if "no-store" not in response.headers.get("Cache-Control", ""):
+            self.put(key, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return body
+
+    def put(self, key, body, etag=None, last_modified=None):
+        digest, size = self._write(body)
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT INTO objects (digest, size) VALUES (?, ?) ON CONFLICT (digest) DO NOTHING",
+                (digest, size),
+            )
+            self._conn.execute(
+                "INSERT INTO entries (key, digest, etag, last_modified, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "digest = excluded.digest, etag = excluded.etag, last_modified = excluded.last_modified, "
+                "fetched_at = excluded.fetched_at, used_at = excluded.used_at",
+                (key, digest, etag, last_modified, now, now),
+            )
+            if old and old[0] != digest:
+                self._drop_if_unused(old[0])
+        self.prune()
+
+    def _touch(self, key, now):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._delete(key)
+
+    def _delete(self, key):
+        # Caller holds the lock and the transaction
+        row = self._conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return 0
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return self._drop_if_unused(row[0])
+
+    def _drop_if_unused(self, digest):
+        # Remove an object no entry points at; returns the bytes freed
+        if self._conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        row = self._conn.execute("SELECT size FROM objects WHERE digest = ?", (digest,)).fetchone()
+        self._conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+        return row[0] if row else 0
+
+    # ----- size -----
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def prune(self):
+        # Evict least recently used entries until the objects fit MAX_BYTES
+        evicted = 0
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            for key, in self._conn.execute("SELECT key FROM entries ORDER BY used_at").fetchall():
+                total -= self._delete(key)
+                evicted += 1
+                if total <= self.max_bytes:
+                    break
+        return evicted
+
+    def clear(self):
+        with self._lock, self._conn:
+            for (digest,) in self._conn.execute("SELECT digest FROM objects").fetchall():
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM objects")
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            objects, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return {"entries": entries, "objects": objects, "bytes": size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Review page cache")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--root", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.root)
+    if args.command == "prune":
+        print(f"Evicted {cache.prune()} entries")
+    elif args.command == "clear":
+        cache.clear()
+        print("Cache cleared")
+    else:
+        stats = cache.stats()
+        print(f"{stats['entries']} pages, {stats['objects']} objects, "
+              f"{stats['bytes'] / 2**20:.1f} of {stats['max_bytes'] / 2**20:.0f} MB")
@@ -1,36 +1,78 @@
-from textblob import TextBlob
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import near_duplicates
+from sentiment import polarities
 
 GENERIC_PHRASES = ["nice product", "good product", "value for money", "awesome"]
 
-def analyze_reviews(reviews):
-    fake = 0
-    genuine = 0
-    suspicious = 0
+# Fewer reviews than this per worker and starting processes and shipping the
+# reviews over costs more than it saves; such calls stay serial
+MIN_SHARD_SIZE = 5000
+
+
+def classify(review, polarity):
+    if len(review.split()) < 6 and polarity > 0.5:
+        return "fake"
+    elif any(p in review.lower() for p in GENERIC_PHRASES):
+        return "suspicious"
+    elif abs(polarity) > 0.8:
+        return "suspicious"
+    return "genuine"
 
+
+def _tally(reviews, offset=0):
+    # Verdict counts, word counts and near-duplicate signatures for one run
+    # of reviews starting at review number offset
+    verdicts = Counter()
     phrase_counter = Counter()
 
-    for review in reviews:
-        lower = review.lower()
-        polarity = TextBlob(review).sentiment.polarity
+    # Scored together in one batch; same values as TextBlob(review).sentiment
+    for review, polarity in zip(reviews, polarities(reviews)):
+        verdicts[classify(review, polarity)] += 1
+        phrase_counter.update(review.lower().split())
+
+    return (verdicts["fake"], verdicts["suspicious"], verdicts["genuine"], phrase_counter,
+            near_duplicates.shard_signatures(reviews, offset))
 
-        if len(review.split()) < 6 and polarity > 0.5:
-            fake += 1
-        elif any(p in lower for p in GENERIC_PHRASES):
-            suspicious += 1
-        elif abs(polarity) > 0.8:
-            suspicious += 1
-        else:
-            genuine += 1
 
-        phrase_counter.update(lower.split())
+def _shards(reviews, count):
+    # (shards, offset of each)
+    size = -(-len(reviews) // count)
+    offsets = range(0, len(reviews), size)
+    return [reviews[i:i + size] for i in offsets], list(offsets)
+
+
+def analyze_reviews(reviews, workers=1, executor=None):
+    # workers > 1 splits the reviews into contiguous shards tallied in a
+    # process pool (executor, when given, is used instead of a new one).
+    # Shards are merged in order, so the result is identical to the serial
+    # one, down to the order of tied common_words.
+    reviews = list(reviews)
+    shards = min(workers, len(reviews) // MIN_SHARD_SIZE)
+
+    if shards <= 1:
+        parts = [_tally(reviews)]
+    elif executor is not None:
+        parts = list(executor.map(_tally, *_shards(reviews, shards)))
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            parts = list(pool.map(_tally, *_shards(reviews, shards)))
+
+    # Counter.update keeps first-seen order, which most_common uses for ties
+    phrase_counter = Counter()
+    for part in parts:
+        phrase_counter.update(part[3])
 
+    # Signatures come from the shards; only bucketing and joining is left
+    groups = near_duplicates.group_signatures(*near_duplicates.merge_signatures([part[4] for part in parts]))
     total = len(reviews)
 
     return {
         "total": total,
-        "fake": fake,
-        "suspicious": suspicious,
-        "genuine": genuine,
-        "common_words": phrase_counter.most_common(5)
+        "fake": sum(part[0] for part in parts),
+        "suspicious": sum(part[1] for part in parts),
+        "genuine": sum(part[2] for part in parts),
+        "common_words": phrase_counter.most_common(5),
+        "duplicate_clusters": near_duplicates.summarize(groups, reviews),
     }
@@ -1,25 +1,231 @@
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0"
 }
 
+# Point at a local stand-in (see standin_server.py) to work offline
+BASE_URL = os.environ.get("REVIEW_BASE_URL", "https://www.amazon.in")
+
+MAX_PAGES = 10
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 2.0   # per host
+RETRIES = 3
+BACKOFF = 0.5               # seconds, doubled on every retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
 def extract_asin(url):
-    import re
     match = re.search(r"/dp/([A-Z0-9]{10})", url)
     return match.group(1) if match else None
 
-def fetch_reviews(asin):
-    url = f"https://www.amazon.in/product-reviews/{asin}"
-    response = requests.get(url, headers=HEADERS, timeout=10)
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    reviews = []
+def review_page_url(asin, page, base_url=None):
+    return f"{base_url or BASE_URL}/product-reviews/{asin}?pageNumber={page}"
+
+
+def make_session(pool_size=MAX_WORKERS):
+    # One keep-alive connection per worker, reused across pages
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class RateLimiter:
+    # Spaces out request starts to each host, shared by all worker threads
+    def __init__(self, per_second=REQUESTS_PER_SECOND):
+        self.interval = 1 / per_second if per_second else 0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def request_page(session, url, limiter, headers=None, retries=RETRIES, backoff=BACKOFF):
+    # Response for one page, or None if it doesn't exist. Connection errors
+    # and throttling/5xx responses are retried with exponential backoff.
+    for attempt in range(retries + 1):
+        limiter.wait(url)
+        try:
+            response = session.get(url, headers=headers, timeout=10)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+        else:
+            if response.status_code == 404:
+                return None
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            if attempt == retries:
+                response.raise_for_status()
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+        time.sleep(delay * random.uniform(1, 1.25))
+
+
+def fetch_page(session, url, limiter, **options):
+    response = request_page(session, url, limiter, **options)
+    return response.text if response is not None else None
+
+
+def _review_or_pagination(classes):
+    # The class attribute arrives as a string or a list depending on the
+    # bs4 version
+    classes = classes.split() if isinstance(classes, str) else (classes or [])
+    return "review" in classes or "a-pagination" in classes
+
+
+# Only review blocks and the pagination bar are built into the tree; the
+# rest of the page (navigation, scripts, widgets) is skipped while parsing
+REVIEW_NODES = SoupStrainer(class_=_review_or_pagination)
+
+PROFILE_RE = re.compile(r"/gp/profile/(amzn1\.account\.[A-Z0-9]+)")
+RATING_HOOKS = ["review-star-rating", "cmps-review-star-rating"]
+RATING_RE = re.compile(r"(\d+(?:\.\d+)?) out of 5")
+DATE_FORMATS = ("%d %B %Y", "%B %d, %Y")   # amazon.in, amazon.com
+
+
+def _review_date(text):
+    # "Reviewed in India on 13 November 2023" -> "2023-11-13"
+    _, _, date = text.rpartition(" on ")
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date.strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return None
+
+
+def parse_review_records(html):
+    # One dict per review on the page (id, reviewer_id, rating, date,
+    # verified, text), how many reviews the page had, and whether this is
+    # the last page
+    soup = BeautifulSoup(html, "html.parser", parse_only=REVIEW_NODES)
+    records = []
+
+    for review in soup.find_all(attrs={"data-hook": "review"}):
+        rating = review.find(attrs={"data-hook": RATING_HOOKS})
+        rating = rating and rating.find(class_="a-icon-alt")
+        rating = rating and RATING_RE.search(rating.get_text())
+        date = review.find(attrs={"data-hook": "review-date"})
+        profile = review.find("a", class_="a-profile")
+        profile = profile and PROFILE_RE.search(profile.get("href", ""))
+        records.append({
+            "id": review.get("id"),
+            "reviewer_id": profile.group(1) if profile else None,
+            "rating": float(rating.group(1)) if rating else None,
+            "date": _review_date(date.get_text(strip=True)) if date else None,
+            "verified": review.find(attrs={"data-hook": "avp-badge"}) is not None,
+            "text": " ".join(
+                span.get_text(strip=True)
+                for body in review.find_all(class_="review-text-content")
+                for span in body.find_all("span")
+            ),
+        })
+
+    # No "next page" link: this is the last page
+    pagination = soup.find(class_="a-pagination")
+    next_link = pagination and pagination.find(class_="a-last")
+    last = next_link is not None and "a-disabled" in next_link.get("class", [])
+    return records, len(records), last
+
+
+def parse_reviews(html):
+    # Texts longer than 20 characters; found still counts the short ones,
+    # so a page of only short reviews is not taken for the end
+    records, found, last = parse_review_records(html)
+    return [r["text"] for r in records if len(r["text"]) > 20], found, last
+
+
+def fetch_review_pages(asin, max_pages=MAX_PAGES, workers=MAX_WORKERS, base_url=None,
+                       per_second=REQUESTS_PER_SECOND, session=None, cache=None, parse=parse_reviews,
+                       limiter=None):
+    # Reviews of pages 1..max_pages as a list per page, fetched `workers` at a
+    # time. Stops at the first page that is missing, has no reviews at all
+    # or is marked last; pages already in flight past that point are
+    # discarded. A page that still fails after its retries (a block page,
+    # a dropped connection) also ends pagination, keeping the pages before
+    # it; only a failure on the first page raises.
+    # cache: a response_cache.ResponseCache; fresh pages skip the network
+    # parse: parse_reviews for texts, parse_review_records for dicts; either
+    # returns (items, reviews found on the page, last)
+    # limiter: a RateLimiter shared with other fetches, instead of per_second
+    session = session or make_session(workers)
+    limiter = limiter or RateLimiter(per_second)
+    pages = {}
+    last_page = max_pages
+
+    def fetch(page):
+        url = review_page_url(asin, page, base_url)
+        if cache is None:
+            html = fetch_page(session, url, limiter)
+        else:
+            # Keyed by the full URL, so stand-ins and stores never share pages
+            html = cache.fetch(url, lambda headers: request_page(session, url, limiter, headers))
+        if html is None:
+            return [], 0, True
+        return parse(html)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        next_page = 1
+        while in_flight or next_page <= last_page:
+            while len(in_flight) < workers and next_page <= last_page:
+                in_flight[next_page] = pool.submit(fetch, next_page)
+                next_page += 1
+
+            # Pages finish in any order; collect the lowest one first so the
+            # stop point is found as soon as possible
+            page = min(in_flight)
+            try:
+                reviews, found, last = in_flight.pop(page).result()
+            except requests.RequestException:
+                if page == 1:
+                    raise
+                found = 0
+            if page > last_page:
+                continue
+            if not found:
+                last_page = page - 1
+            else:
+                pages[page] = reviews
+                if last:
+                    last_page = page
+            for extra in [p for p in in_flight if p > last_page]:
+                in_flight.pop(extra).cancel()
+
+    return [pages[page] for page in sorted(pages) if page <= last_page]
+
+
+def fetch_reviews(asin, max_pages=MAX_PAGES, **options):
+    return [review for page in fetch_review_pages(asin, max_pages, **options) for review in page]
 
-    for block in soup.select(".review-text-content span"):
-        text = block.get_text(strip=True)
-        if len(text) > 20:
-            reviews.append(text)
 
-    return reviews[:20]  # limit to avoid blocking
+def fetch_review_records(asin, max_pages=MAX_PAGES, **options):
+    pages = fetch_review_pages(asin, max_pages, parse=parse_review_records, **options)
+    return [record for page in pages for record in page]
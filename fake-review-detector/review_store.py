@@ -0,0 +1,209 @@
+# Reviews seen per product, with their score, so a product analysed again
+# only scores the reviews that are new since last time.
+#
+#   reviews        (asin, hash, copy) -> text, polarity, verdict, MinHash
+#   product_totals asin -> review and verdict counts
+#   product_words  (asin, word) -> count, and when the word was first seen
+#
+# hash is the SHA-1 of the review text; copy numbers identical texts within
+# one product, so a copy-paste ring of five counts five times and fetching
+# the same five again adds nothing. Totals and word counts are kept as
+# running aggregates and updated with the new reviews only, so the result
+# equals analyze_reviews over every review stored for the product, in the
+# order they were first seen.
+#
+#   python review_store.py show B0SAMPLE01
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+import near_duplicates
+from review_analyzer import classify
+from sentiment import polarities
+
+STORE_FILE = os.environ.get("REVIEW_STORE_FILE", "reviews.db")
+PRODUCT_LOCKS = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    asin TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    copy INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    polarity REAL NOT NULL,
+    verdict TEXT NOT NULL,
+    signature BLOB,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (asin, hash, copy)
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_seq ON reviews(asin, seq);
+CREATE TABLE IF NOT EXISTS product_totals (
+    asin TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    fake INTEGER NOT NULL,
+    suspicious INTEGER NOT NULL,
+    genuine INTEGER NOT NULL,
+    next_word INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_words (
+    asin TEXT NOT NULL,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_seen INTEGER NOT NULL,
+    PRIMARY KEY (asin, word)
+);
+"""
+
+
+def review_keys(reviews):
+    # (hash, copy) per review; the n-th repeat of a text gets copy n
+    seen = Counter()
+    keys = []
+    for review in reviews:
+        digest = hashlib.sha1(review.encode("utf-8")).hexdigest()
+        keys.append((digest, seen[digest]))
+        seen[digest] += 1
+    return keys
+
+
+def score(texts):
+    # Polarity, verdict, word counts and MinHash blobs of new reviews; pure,
+    # so it can run in a worker process
+    scores = polarities(texts)
+    verdicts = [classify(review, float(p)) for review, p in zip(texts, scores)]
+    words = Counter()
+    for review in texts:
+        words.update(review.lower().split())
+    indices, signature = near_duplicates.signatures(texts)
+    blobs = dict(zip(indices.tolist(), (s.astype(np.uint32).tobytes() for s in signature)))
+    return scores, verdicts, words, blobs
+
+
+class ReviewStore:
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # Analyses of one product run one at a time (different products in
+        # parallel), so a review is never scored and counted twice
+        self._product_locks = [threading.Lock() for _ in range(PRODUCT_LOCKS)]
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def analyze(self, asin, reviews, executor=None):
+        # analyze_reviews result over all stored reviews of asin, after
+        # adding (and scoring) the ones not stored yet. "new" is how many
+        # that was. executor: a process pool to score them in, so only the
+        # SQLite work runs in the calling thread
+        reviews = list(reviews)
+        keys = review_keys(reviews)
+        with self._product_locks[hash(asin) % PRODUCT_LOCKS]:
+            with self._lock:
+                stored = set(self._conn.execute("SELECT hash, copy FROM reviews WHERE asin = ?", (asin,)))
+            new = [(key, review) for key, review in zip(keys, reviews) if key not in stored]
+
+            if new:
+                texts = [review for _, review in new]
+                scored = executor.submit(score, texts).result() if executor else score(texts)
+                self._add(asin, new, *scored)
+            result = self.result(asin)
+        result["new"] = len(new)
+        return result
+
+    def _add(self, asin, new, scores, verdicts, words, blobs):
+        now = time.time()
+        counts = Counter(verdicts)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT total, next_word FROM product_totals WHERE asin = ?", (asin,)
+            ).fetchone()
+            seq, next_word = row or (0, 0)
+            self._conn.executemany(
+                "INSERT INTO reviews (asin, hash, copy, seq, text, polarity, verdict, signature, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (asin, key[0], key[1], seq + i, review, float(scores[i]), verdicts[i], blobs.get(i), now)
+                    for i, (key, review) in enumerate(new)
+                ],
+            )
+            self._conn.execute(
+                "INSERT INTO product_totals (asin, total, fake, suspicious, genuine, next_word, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (asin) DO UPDATE SET "
+                "total = total + excluded.total, fake = fake + excluded.fake, "
+                "suspicious = suspicious + excluded.suspicious, genuine = genuine + excluded.genuine, "
+                "next_word = excluded.next_word, updated_at = excluded.updated_at",
+                (asin, len(new), counts["fake"], counts["suspicious"], counts["genuine"],
+                 next_word + len(words), now),
+            )
+            # Words already counted keep their first_seen, so ties in
+            # common_words break the same way a single Counter would
+            self._conn.executemany(
+                "INSERT INTO product_words (asin, word, count, first_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (asin, word) DO UPDATE SET count = count + excluded.count",
+                [(asin, word, count, next_word + i) for i, (word, count) in enumerate(words.items())],
+            )
+
+    def result(self, asin, top_words=5):
+        # Same shape as analyze_reviews, from the stored aggregates
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT total, fake, suspicious, genuine FROM product_totals WHERE asin = ?", (asin,)
+            ).fetchone() or (0, 0, 0, 0)
+            common = self._conn.execute(
+                "SELECT word, count FROM product_words WHERE asin = ? "
+                "ORDER BY count DESC, first_seen LIMIT ?", (asin, top_words)
+            ).fetchall()
+            rows = self._conn.execute(
+                "SELECT text, signature FROM reviews WHERE asin = ? ORDER BY seq", (asin,)
+            ).fetchall()
+
+        texts = [text for text, _ in rows]
+        indices = [i for i, (_, blob) in enumerate(rows) if blob is not None]
+        signature = np.array(
+            [np.frombuffer(rows[i][1], dtype=np.uint32) for i in indices], dtype=np.uint64
+        ).reshape(len(indices), near_duplicates.NUM_PERM)
+        clusters = near_duplicates.group_signatures(np.array(indices, dtype=np.int64), signature)
+
+        return {
+            "total": totals[0],
+            "fake": totals[1],
+            "suspicious": totals[2],
+            "genuine": totals[3],
+            "common_words": common,
+            "duplicate_clusters": near_duplicates.summarize(clusters, texts),
+        }
+
+    def forget(self, asin):
+        with self._lock, self._conn:
+            for table in ("reviews", "product_totals", "product_words"):
+                self._conn.execute(f"DELETE FROM {table} WHERE asin = ?", (asin,))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from formatter import format_whatsapp
+
+    parser = argparse.ArgumentParser(description="Stored review analysis")
+    parser.add_argument("command", choices=["show", "forget"])
+    parser.add_argument("asin")
+    parser.add_argument("--path", default=STORE_FILE)
+    args = parser.parse_args()
+
+    store = ReviewStore(args.path)
+    if args.command == "forget":
+        store.forget(args.asin)
+        print(f"Forgot {args.asin}")
+    else:
+        print(format_whatsapp(store.result(args.asin)))
@@ -0,0 +1,230 @@
+# Batched review polarity with TextBlob's lexicon (pattern's en-sentiment.xml).
+#
+# TextBlob(review).sentiment tokenizes one review and then assesses it one
+# word at a time in Python. Here the whole batch is tokenized in one regex
+# pass, every token becomes an id in a vocabulary of precomputed word
+# features, and the same rules run over the whole batch as NumPy array
+# operations:
+#
+#   known word           scored with its polarity        "good"
+#   after an adverb      polarity * adverb intensity     "very good"
+#   after a negation     flipped and halved, intensity inverted
+#                                                        "not good", "not very good"
+#   "!"                  boosts the previous score 25%   "good!!"
+#   emoticons, "(!)"     scored as their own entries     ":)", "(!)"
+#
+# Polarity is the mean over the scored entries of a review, 0.0 if none.
+#
+# Tolerance: polarities agree with TextBlob's to within 1e-12 per review; the
+# only differences are float rounding in the mean. A review scored exactly
+# at a verdict threshold could in principle land on the other side.
+# benchmarks/bench_sentiment.py checks this on every run.
+# Tokens are not split exactly like TextBlob (runs of periods give extra "."
+# tokens), but none of those can be a lexicon word or change a rule.
+
+import re
+
+import numpy as np
+from textblob._text import ABBREVIATIONS, EMOTICONS, PUNCTUATION
+from textblob.en import sentiment as LEXICON
+
+NEGATIONS = ("no", "not", "n't", "never")
+MODIFIER = "RB"
+
+# Quotes and the "n't" of contractions become tokens of their own
+QUOTES_RE = re.compile("[“”‘’'\"]")
+
+# TextBlob splits leading punctuation, then trailing punctuation, ellipses
+# and periods, and keeps the rest of a whitespace chunk as one token
+# ("good,but", "5/5", "...bad"). Abbreviations keep their period ("Mr.").
+_P = re.escape(PUNCTUATION.replace(".", ""))
+_WORD = rf"[^\s.{_P}]"
+_ABBR = "|".join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True) if a.endswith("."))
+# Leading whitespace is consumed with each token so that findall() never
+# stops on a space; plain words take the first, cheapest branch.
+TOKEN_RE = re.compile(
+    rf"\s*({_WORD}+(?=\s|$)"
+    rf"|(?:{_ABBR}|(?:[A-Za-z]\.)+|[A-Z][bcdfghjklmnpqrstvwxz|]+\.)(?!\.\.)(?=[.{_P}]*(?:\s|$))"
+    rf"|(?:{_WORD}|\.\S*?{_WORD})(?:\S*?{_WORD})?(?=[.{_P}]*(?:\s|$))"
+    rf"|\.\.\.|[.{_P}])"
+)
+# Put back what the splitting above pulled apart: "( ! )", ": )"
+SARCASM_RE = re.compile(r"\( ?! ?\)")
+EMOTICON_RE = re.compile(
+    r"(%s)($|\s)" % "|".join(r" ?".join(map(re.escape, e)) for faces in EMOTICONS.values() for e in faces)
+)
+EMOTICON_POLARITY = {e.lower(): p for (_, p), faces in EMOTICONS.items() for e in faces}
+
+# Review separator in the joined batch; never produced by the tokenizer
+SEPARATOR = "\x00"
+
+
+def tokenize(reviews):
+    # One string for the whole batch: lower-cased tokens, reviews separated
+    # by SEPARATOR tokens
+    text = QUOTES_RE.sub(r" \g<0> ", f" {SEPARATOR} ".join(reviews).replace("n't", " n't"))
+    text = " ".join(TOKEN_RE.findall(text))
+    text = SARCASM_RE.sub("(!)", text)
+    text = EMOTICON_RE.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), text)
+    return text.lower().split(" ")
+
+
+# ---------- VOCABULARY ----------
+class Vocabulary(dict):
+    # token -> id, with one row of features per id. Lexicon words are loaded
+    # up front; other tokens get an id (and their features) the first time
+    # they are seen.
+    FIELDS = ("polarity", "intensity", "known", "modifier", "adverb", "negation",
+              "exclamation", "entry", "resets_modifier", "long_negation", "resets_negation")
+
+    def __init__(self):
+        super().__init__()
+        LEXICON.load()
+        self._rows = []
+        self._arrays = None
+        for word, senses in sorted(dict.items(LEXICON)):
+            p, _, i = senses[None]
+            self._add(word, p, i, known=True, modifier=MODIFIER in senses)
+        self[SEPARATOR]
+
+    def _add(self, token, polarity=0.0, intensity=1.0, known=False, modifier=False, entry=False):
+        self[token] = len(self._rows)
+        negation = token in NEGATIONS and not known
+        self._rows.append((
+            polarity, intensity, known, modifier, token.endswith("ly"), negation,
+            token == "!", entry,
+            not known and not negation and len(token) > 2,
+            negation and len(token) > 2,
+            not known and not negation and len(token.strip("'")) > 1,
+        ))
+        self._arrays = None
+        return self[token]
+
+    def __missing__(self, token):
+        if token == "(!)":
+            return self._add(token, 0.0, entry=True)
+        if token in EMOTICON_POLARITY and not token.isalpha():
+            return self._add(token, EMOTICON_POLARITY[token], entry=True)
+        return self._add(token)
+
+    def arrays(self):
+        if self._arrays is None:
+            columns = list(zip(*self._rows))
+            self._arrays = {
+                name: np.array(column, dtype=float if name in ("polarity", "intensity") else bool)
+                for name, column in zip(self.FIELDS, columns)
+            }
+        return self._arrays
+
+
+_vocabulary = None
+
+
+def vocabulary():
+    global _vocabulary
+    if _vocabulary is None:
+        _vocabulary = Vocabulary()
+    return _vocabulary
+
+
+# ---------- SCORING ----------
+def _last_before(mask):
+    # Index of the last True strictly before each position, -1 if none
+    index = np.where(mask, np.arange(len(mask)), -1)
+    return np.concatenate(([-1], np.maximum.accumulate(index)[:-1]))
+
+
+def _none_between(counts, start, end):
+    # No marked token strictly between start and end, from an inclusive
+    # cumulative count; start may be -1
+    return counts[end - 1] == np.where(start >= 0, counts[np.maximum(start, 0)], 0)
+
+
+def polarities(reviews):
+    # TextBlob polarity of every review, as a float array
+    reviews = list(reviews)
+    if not reviews:
+        return np.zeros(0)
+    vocab = vocabulary()
+    tokens = tokenize(reviews)
+    ids = np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+    f = {name: column[ids] for name, column in vocab.arrays().items()}
+
+    # Review of every token and the position it starts at
+    separator = ids == vocab[SEPARATOR]
+    review = np.cumsum(separator)
+    starts = np.flatnonzero(np.concatenate(([True], separator)))[review]
+    positions = np.arange(len(ids))
+
+    known = f["known"]
+    entry_token = f["entry"]
+    negation = f["negation"]
+    resets_m = np.cumsum(f["resets_modifier"])
+    resets_m_long_negation = np.cumsum(f["long_negation"])
+    resets_n = np.cumsum(f["resets_negation"])
+    entries_so_far = np.cumsum(entry_token)
+
+    # Previous known word of the same review
+    prev_known = _last_before(known)
+    prev_known = np.where(prev_known >= starts, prev_known, -1)
+    has_prev = prev_known >= 0
+    pk = np.maximum(prev_known, 0)
+
+    # A modifier is still active when no longer word came after it; a
+    # negation longer than two letters also ends it unless it attaches to
+    # an "-ly" adverb ("really not good")
+    modifier_active = (
+        has_prev & f["modifier"][pk]
+        & _none_between(resets_m, prev_known, positions)
+        & (f["adverb"][pk] | _none_between(resets_m_long_negation, prev_known, positions))
+    )
+    attached = negation & modifier_active & f["adverb"][pk]
+
+    # The last negation since the previous known word is active unless it
+    # attached or a longer word came after it
+    last_negation = _last_before(negation)
+    ln = np.maximum(last_negation, 0)
+    negated = (
+        known & (last_negation >= starts) & (last_negation > prev_known)
+        & ~attached[ln] & _none_between(resets_n, last_negation, positions)
+    )
+
+    # Entries: a known word either starts one or merges into the latest
+    merged = known & modifier_active
+    creates = (known & ~merged) | entry_token
+    entry = np.cumsum(creates) - 1
+    entry_review = review[creates]
+    count = len(entry_review)
+    if count == 0:
+        return np.zeros(len(reviews))
+
+    # Intensity carried by each known word (inverted when negated); a merge
+    # multiplies by the latest entry's, which is 1.0 for an emoticon entry
+    intensity = np.where(negated, 1.0 / f["intensity"], f["intensity"])
+    carried = np.where(entries_so_far[positions - 1] == entries_so_far[pk], intensity[pk], 1.0)
+    value = np.where(merged, np.clip(f["polarity"] * carried, -1.0, 1.0), f["polarity"])
+
+    # An entry's score is set by its last known word (or its emoticon); "!"
+    # after that boosts it
+    setters = np.flatnonzero(known | entry_token)
+    last = np.concatenate((entry[setters][1:] != entry[setters][:-1], [True]))
+    setters = setters[last]
+    score = np.zeros(count)
+    last_set = np.zeros(count, dtype=np.int64)
+    score[entry[setters]] = value[setters]
+    last_set[entry[setters]] = setters
+
+    exclamations = np.flatnonzero(f["exclamation"] & (entry >= 0))
+    exclamations = exclamations[entry_review[entry[exclamations]] == review[exclamations]]
+    exclamations = exclamations[exclamations > last_set[entry[exclamations]]]
+    boosts = np.bincount(entry[exclamations], minlength=count)
+    score = np.clip(score * 1.25 ** boosts, -1.0, 1.0)
+
+    flipped = np.zeros(count, dtype=bool)
+    flipped[entry[negated]] = True
+    flipped[entry[attached]] = True
+    score = np.where(flipped, score * -0.5, score)
+
+    totals = np.bincount(entry_review, weights=score, minlength=len(reviews))
+    counts = np.bincount(entry_review, minlength=len(reviews))
+    return totals / np.maximum(counts, 1)
@@ -0,0 +1,112 @@
+# Local stand-in for the Amazon review pages, serving saved HTML so the
+# scraper can be run and timed without hitting the real site.
+#
+#   samples/<ASIN>/page-<n>.html
+#
+#   python standin_server.py --port 8765 --delay 0.2 --fail-rate 0.1
+#   REVIEW_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+#
+# Pages past the last saved one come back as an empty review list, like the
+# real site; unknown ASINs are a 404. Responses carry an ETag and honour
+# If-None-Match. --fail-rate answers that share of requests with a 503 to
+# exercise the retries.
+
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+EMPTY_PAGE = """<!doctype html>
+<html><body><div id="cm_cr-review_list" class="a-section">
+<div class="a-section a-spacing-top-large a-text-center no-reviews-section">
+<span class="a-size-medium">Sorry, no reviews match your current selections.</span>
+</div></div></body></html>
+"""
+
+PATH_RE = re.compile(r"^/product-reviews/([A-Z0-9]{10})")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    root = SAMPLES_DIR
+    delay = 0.0
+    fail_rate = 0.0
+    requests_served = 0
+    _count_lock = threading.Lock()
+
+    def do_GET(self):
+        with self._count_lock:
+            type(self).requests_served += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+        url = urlsplit(self.path)
+        match = PATH_RE.match(url.path)
+        asin_dir = os.path.join(self.root, match.group(1)) if match else None
+        if asin_dir is None or not os.path.isdir(asin_dir):
+            self._send(404, b"Not found")
+            return
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._send(503, b"Service unavailable", {"Retry-After": "0"})
+            return
+
+        page = int(parse_qs(url.query).get("pageNumber", ["1"])[0])
+        path = os.path.join(asin_dir, f"page-{page}.html")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+        else:
+            body = EMPTY_PAGE.encode()
+        # Validators, so clients can revalidate with If-None-Match
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        self._send(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(root=SAMPLES_DIR, host="127.0.0.1", port=0, delay=0.0, fail_rate=0.0):
+    # Start in a background thread; server.url is the base URL to scrape.
+    # Call server.shutdown() when done.
+    handler = type("Handler", (StandInHandler,), {"root": root, "delay": delay, "fail_rate": fail_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.handler = handler
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve saved review pages")
+    parser.add_argument("--root", default=SAMPLES_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 503")
+    args = parser.parse_args()
+
+    server = serve(args.root, args.host, args.port, args.delay, args.fail_rate)
+    print(f"Serving {args.root} at {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,88 @@
+import pytest
+import requests
+
+import standin_server
+from response_cache import ResponseCache
+from review_scraper import fetch_review_records, fetch_reviews
+
+ASIN = "B0TESTPAGE"
+
+REVIEW = """<div data-hook="review" id="R{n}" class="a-section review aok-relative">
+<div class="a-row a-spacing-small review-data"><span data-hook="review-body"
+class="a-size-base review-text review-text-content"><span>{text}</span></span></div></div>
+"""
+PAGINATION = """<ul class="a-pagination"><li class="a-last{disabled}"><a href="#">Next page</a></li></ul>"""
+
+
+def page(texts, last=False):
+    reviews = "".join(REVIEW.format(n=i, text=text) for i, text in enumerate(texts))
+    return (f'<html><body><div id="cm_cr-review_list" class="a-section">{reviews}</div>'
+            f'{PAGINATION.format(disabled=" a-disabled" if last else "")}</body></html>')
+
+
+def write_pages(root, pages):
+    product = root / ASIN
+    product.mkdir()
+    for number, html in enumerate(pages, 1):
+        (product / f"page-{number}.html").write_text(html, encoding="utf-8")
+
+
+def fetch(root, fetcher=fetch_reviews, fail_rate=0.0, **options):
+    server = standin_server.serve(str(root), fail_rate=fail_rate)
+    try:
+        return fetcher(ASIN, max_pages=10, base_url=server.url, per_second=0, **options)
+    finally:
+        server.shutdown()
+
+
+def test_page_of_short_reviews_does_not_end_pagination(tmp_path):
+    long = [f"Review number {i} with enough words to be kept." for i in range(10)]
+    write_pages(tmp_path, [
+        page(long),
+        page(["Good"] * 20),          # all dropped by parse_reviews
+        page(long, last=True),
+    ])
+    assert fetch(tmp_path) == long + long
+    assert len(fetch(tmp_path, fetch_review_records)) == 40
+
+
+def test_stops_at_first_page_without_reviews(tmp_path):
+    long = ["Arrived on time and works exactly as described."]
+    write_pages(tmp_path, [page(long), page([]), page(long)])
+    for workers in (1, 4):
+        assert fetch(tmp_path, workers=workers) == long
+
+
+def test_cache_keeps_pages_of_different_hosts_apart(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    for name in ("first", "second"):
+        root = tmp_path / name
+        root.mkdir()
+        write_pages(root, [page([f"Review served by the {name} stand-in server."], last=True)])
+        assert fetch(root, cache=cache) == [f"Review served by the {name} stand-in server."]
+
+
+class BlockedPage(requests.Session):
+    # Answers one page with a 403, as a block page would
+    def __init__(self, page):
+        super().__init__()
+        self.page = page
+
+    def get(self, url, **options):
+        response = super().get(url, **options)
+        if url.endswith(f"pageNumber={self.page}"):
+            response.status_code = 403
+        return response
+
+
+def test_failed_page_ends_pagination_and_keeps_earlier_pages(tmp_path):
+    long = [f"Review number {i} with enough words to be kept." for i in range(3)]
+    write_pages(tmp_path, [page(long), page(long), page(long), page(long, last=True)])
+    for workers in (1, 4):
+        assert fetch(tmp_path, workers=workers, session=BlockedPage(3)) == long + long
+
+
+def test_failed_first_page_raises(tmp_path):
+    write_pages(tmp_path, [page(["Arrived on time and works exactly as described."], last=True)])
+    with pytest.raises(requests.RequestException):
+        fetch(tmp_path, fail_rate=1.0)